@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 import pandas as pd
 import numpy as np
 import amplpy
@@ -9,6 +10,9 @@ from datetime import datetime
 import yfinance as yf
 import logging
 from performance_metrics import calculate_correlation, evaluate_performance, save_performance_metrics
+from generate_data import generate_ampl_data
+from returns_panel import ReturnsPanel
+from solution_cache import solution_key, problem_family, hash_file
 
 # Set up logging configuration
 logging.basicConfig(
@@ -20,18 +24,29 @@ logging.basicConfig(
 plt.style.use('default')
 sns.set_theme()
 
-def run_ampl_model():
+def run_ampl_model(model_path="data/ampl/sp100_tracking.mod",
+                   data_path="data/ampl/sp100_tracking.dat", solver="ipopt", initial_weights=None):
     # Run the AMPL optimization model and return the results
     try:
         # Initialize AMPL environment
         ampl = amplpy.AMPL()
         
         # Set AMPL directory
-        ampl.setOption("solver", "ipopt")
+        ampl.setOption("solver", solver)
         
         # Read model and data files
-        ampl.read("data/ampl/sp100_tracking.mod")
-        ampl.readData("data/ampl/sp100_tracking.dat")
+        ampl.read(model_path)
+        ampl.readData(data_path)
+        
+        # Warm start from a previous solution of a near-identical problem
+        if initial_weights is not None:
+            x = ampl.getVariable("x")
+            y = ampl.getVariable("y")
+            stocks = set(map(str, ampl.getSet("STOCKS")))
+            for stock, weight in initial_weights.items():
+                if stock in stocks:
+                    x[stock].setValue(weight)
+                    y[stock].setValue(1 if weight > 1e-9 else 0)
         
         # Solve the model
         ampl.solve()
@@ -44,6 +59,63 @@ def run_ampl_model():
         logging.error(f"Error in run_ampl_model: {str(e)}")
         raise
 
+def solve_tracking(returns, benchmark_returns, q=10, model_path="data/ampl/sp100_tracking.mod",
+                   data_dir=None, solver="ipopt", cache=None):
+    """
+    Solve the tracking model for one returns window, reusing cached solutions when possible
+
+    Each solve writes its own temporary .dat file (in data_dir, or the system
+    temp directory) and deletes it afterwards, so concurrent workers never
+    share a data file and the checked-in data/ampl/sp100_tracking.dat is left alone.
+    """
+    try:
+        # Model identity is its file content, so editing the .mod invalidates cached solutions
+        options = {'solver': solver, 'model': hash_file(model_path)}
+        symbols = returns.symbols if isinstance(returns, ReturnsPanel) else returns.columns
+        key = solution_key(returns, benchmark_returns, q, 'ampl_tracking', options)
+        family = problem_family(symbols, q, 'ampl_tracking', options)
+        
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logging.info(f"AMPL solution cache hit ({key[:12]})")
+                return cached['weights'], cached['objective'], cached['stats']
+        
+        initial_weights = cache.warm_start(family) if cache is not None else None
+        
+        if data_dir is not None:
+            os.makedirs(data_dir, exist_ok=True)
+        fd, data_path = tempfile.mkstemp(suffix='.dat', prefix=f'sp100_tracking_{key[:12]}_', dir=data_dir)
+        os.close(fd)
+        try:
+            generate_ampl_data(returns, benchmark_returns, data_path, q=q)
+            ampl = run_ampl_model(model_path, data_path, solver, initial_weights)
+        finally:
+            os.remove(data_path)
+        
+        x = ampl.getVariable("x")
+        weights = pd.Series({str(i): x[i].value() for i in ampl.getSet("STOCKS")})
+        objective = ampl.getObjective("Tracking_Error").value()
+        stats = {
+            'solve_result': ampl.getValue('solve_result'),
+            'solve_time': ampl.getValue('_solve_elapsed_time'),
+            'warm_start': initial_weights is not None
+        }
+        ampl.close()
+        
+        # Only optimal solves are cached: a failed one would otherwise come back as a hit and a warm start
+        if cache is not None:
+            if stats['solve_result'] == 'solved':
+                cache.put(key, family, weights, objective, stats)
+            else:
+                logging.warning(f"AMPL solve_result is {stats['solve_result']}; solution not cached ({key[:12]})")
+        
+        return weights, objective, stats
+        
+    except Exception as e:
+        logging.error(f"Error in solve_tracking: {str(e)}")
+        raise
+
 def get_results(ampl):
     # Get optimization results
     try:
@@ -57,30 +129,21 @@ def get_results(ampl):
         weights = pd.Series(weights)
         
         # Get time periods and stocks
-        T = list(map(str, ampl.getSet("T")))
+        T = [str(int(t)) for t in ampl.getSet("T")]
         stocks = list(map(str, ampl.getSet("STOCKS")))
         
-        # Create DataFrame for returns
-        returns_df = pd.DataFrame(0, index=T, columns=stocks)
-        for i in stocks:
-            for t in T:
-                try:
-                    returns_df.loc[t, i] = ampl.getParameter("returns")[i, int(t)]
-                except:
-                    continue
+        # Read each parameter in one bulk call instead of one lookup per cell
+        returns = pd.Series(ampl.getParameter("returns").getValues().toDict(), dtype=float)
+        returns.index = pd.MultiIndex.from_tuples([(str(i), str(int(t))) for i, t in returns.index])
+        returns_df = returns.unstack(level=0).reindex(index=T, columns=stocks).fillna(0)
     
-    # Calculate portfolio returns
-        portfolio_returns = pd.Series(0, index=T)
-        for t in T:
-            portfolio_returns[t] = (returns_df.loc[t] * weights).sum()
+        # Calculate portfolio returns
+        portfolio_returns = returns_df.dot(weights[stocks])
     
-    # Get benchmark returns
-        benchmark_returns = pd.Series(0, index=T)
-        for t in T:
-            try:
-                benchmark_returns[t] = ampl.getParameter("benchmark")[int(t)]
-            except:
-                continue
+        # Get benchmark returns
+        benchmark = ampl.getParameter("benchmark").getValues().toDict()
+        benchmark_returns = pd.Series({str(int(t)): v for t, v in benchmark.items()}, dtype=float)
+        benchmark_returns = benchmark_returns.reindex(T).fillna(0)
         
         return weights, portfolio_returns, benchmark_returns
         
@@ -116,12 +179,12 @@ def plot_results(weights, portfolio_returns, benchmark_returns):
         plt.axhline(y=0.95, color='r', linestyle='--', label='0.95 Correlation Target')
         plt.legend()
     
-    plt.tight_layout()
+        plt.tight_layout()
         
         # Save results
         os.makedirs('results', exist_ok=True)
         plt.savefig('results/ampl_portfolio.png')
-    plt.close()
+        plt.close()
 
         logging.info("Results plotted and saved to results/ampl_portfolio.png")
         
@@ -141,7 +204,7 @@ def main():
         # Get results
         weights, portfolio_returns, benchmark_returns = get_results(ampl)
     
-    # Plot results
+        # Plot results
         plot_results(weights, portfolio_returns, benchmark_returns)
         
         # Evaluate and save performance
@@ -0,0 +1,406 @@
+import pandas as pd
+import numpy as np
+import argparse
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from returns_panel import ReturnsPanel
+from pca_approach import load_data, load_benchmark_returns, calculate_returns, apply_pca, construct_portfolio
+from performance_metrics import evaluate_performance
+
+# Set up logging configuration
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+def load_benchmark_matrix(path='data/processed/benchmark_matrix.csv'):
+    """
+    Load a wide benchmark file (date column plus one column per benchmark)
+    """
+    try:
+        benchmarks = pd.read_csv(path)
+        benchmarks['date'] = pd.to_datetime(benchmarks['date'], utc=True)
+        benchmarks = benchmarks.set_index('date')
+
+        logging.info(f"Loaded {len(benchmarks.columns)} benchmarks from {path}")
+
+        return benchmarks
+
+    except Exception as e:
+        logging.error(f"Error in load_benchmark_matrix: {str(e)}")
+        raise
+
+def load_sector_map(path='data/raw/sectors.csv'):
+    """
+    Load the symbol -> sector map used to build sector sub-indices
+    """
+    try:
+        sectors = pd.read_csv(path, dtype=str).set_index('symbol')['sector']
+        return sectors
+
+    except Exception as e:
+        logging.error(f"Error in load_sector_map: {str(e)}")
+        raise
+
+def build_benchmark_matrix(prices, sectors, benchmark_returns=None, market_caps=None,
+                           output_path='data/processed/benchmark_matrix.csv'):
+    """
+    Build one sub-index return series per sector from stock prices
+
+    Sub-indices are equal-weighted over the members with a return on each date,
+    or cap-weighted when market_caps (symbol -> cap at the first date) is given,
+    holding share counts fixed so the weights drift with prices. The OEX
+    benchmark series, when given, is added as the 'OEX' column.
+    """
+    try:
+        returns = prices.pct_change().iloc[1:]
+        sectors = sectors.reindex(returns.columns).dropna()
+
+        if market_caps is None:
+            weights = pd.DataFrame(1.0, index=returns.index, columns=returns.columns)
+        else:
+            # Cap at the previous close: initial cap scaled by the price move since the first date
+            first_prices = prices.bfill().iloc[0]
+            caps = market_caps.reindex(returns.columns).fillna(0)
+            weights = prices.shift(1).iloc[1:].div(first_prices).mul(caps)
+        weights = weights.where(returns.notna(), 0.0)
+
+        benchmarks = {}
+        for sector, members in sectors.groupby(sectors).groups.items():
+            total = weights[members].sum(axis=1)
+            weighted = returns[members].fillna(0).mul(weights[members]).sum(axis=1)
+            benchmarks[sector] = weighted / total.where(total > 0)
+        benchmarks = pd.DataFrame(benchmarks)
+
+        if benchmark_returns is not None:
+            benchmarks['OEX'] = benchmark_returns.reindex(benchmarks.index)
+        benchmarks.index.name = 'date'
+
+        if output_path is not None:
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            benchmarks.to_csv(output_path)
+            logging.info(f"Benchmark matrix with {len(benchmarks.columns)} benchmarks saved to {output_path}")
+
+        return benchmarks
+
+    except Exception as e:
+        logging.error(f"Error in build_benchmark_matrix: {str(e)}")
+        raise
+
+def align_batch(returns, benchmarks):
+    """
+    Align stock returns (a ReturnsPanel or DataFrame) and the benchmark matrix
+    on their common complete dates once; returns a ReturnsPanel and the benchmarks
+    """
+    try:
+        if not isinstance(returns, ReturnsPanel):
+            returns = ReturnsPanel.from_frame(returns)
+
+        common_index = returns.dates.intersection(benchmarks.index)
+        rows = returns.dates.get_indexer(common_index)
+        benchmarks = benchmarks.loc[common_index]
+
+        # Drop dates where any benchmark or stock is missing so every column shares one design matrix
+        valid = benchmarks.notna().all(axis=1).to_numpy() & returns.complete_rows()[rows]
+
+        return returns.take(rows[valid]), benchmarks.loc[valid]
+
+    except Exception as e:
+        logging.error(f"Error in align_batch: {str(e)}")
+        raise
+
+def _gram_and_cross(values, rows, B, block_size=4096):
+    # R'R and R'B over the selected rows, accumulated in float64 one row block at a time
+    n_stocks = values.shape[1]
+    gram = np.zeros((n_stocks, n_stocks))
+    cross = np.zeros((n_stocks, B.shape[1]))
+    B_rows = np.flatnonzero(rows)
+    for start in range(0, len(values), block_size):
+        stop = start + block_size
+        block_rows = rows[start:stop]
+        R = values[start:stop][block_rows].astype(np.float64)
+        b = B[np.searchsorted(B_rows, start):np.searchsorted(B_rows, stop)]
+        gram += R.T @ R
+        cross += R.T @ b
+    return gram, cross
+
+def prepare_shared_factors(returns, benchmarks, n_components=10):
+    """
+    Compute the benchmark-independent factorizations shared by every benchmark
+
+    returns is a ReturnsPanel aligned with benchmarks; only its complete rows are used
+    """
+    try:
+        rows = returns.complete_rows()
+        B = benchmarks.to_numpy(dtype=float)[rows]
+
+        # Stock Gram matrix and all K right-hand sides, read straight from the panel block
+        gram, cross = _gram_and_cross(returns.values, rows, B)
+
+        # PCA of the stock universe does not depend on the benchmark
+        component_weights, explained_variance, pca_result = apply_pca(returns, n_components)
+
+        # Regress every benchmark on the PC scores in a single least-squares call
+        factor_betas, _, _, _ = np.linalg.lstsq(pca_result, B - B.mean(axis=0), rcond=None)
+
+        return {
+            'gram': gram,
+            'cross': cross,
+            'component_weights': component_weights,
+            'explained_variance': explained_variance,
+            'factor_betas': factor_betas
+        }
+
+    except Exception as e:
+        logging.error(f"Error in prepare_shared_factors: {str(e)}")
+        raise
+
+def _equality_qp(gram, cross, free):
+    # min w'Gw - 2c'w over the free stocks s.t. 1'w = 1; returns (weights, multiplier nu with grad = nu on free stocks)
+    n = len(free)
+    kkt = np.zeros((n + 1, n + 1))
+    kkt[:n, :n] = 2 * gram[np.ix_(free, free)]
+    kkt[:n, n] = 1
+    kkt[n, :n] = 1
+    rhs = np.concatenate([2 * cross[free], [1.0]])
+    solution = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+    return solution[:n], -solution[n]
+
+def solve_tracking_weights(gram, cross, selected, tol=1e-12, max_iter=None):
+    """
+    Minimise squared tracking error w'Gw - 2c'w over the selected stocks
+    subject to weights summing to one and being non-negative
+
+    Primal active-set method: stocks pinned at zero are released again when
+    their KKT multiplier is negative, so the result is the exact optimum of the
+    convex QP rather than a drop-only heuristic.
+    """
+    try:
+        selected = list(selected)
+        n = len(selected)
+        max_iter = max_iter or 10 * n + 100
+
+        # Feasible start: equal weights, nothing pinned at zero
+        w = np.full(n, 1.0 / n)
+        pinned = np.zeros(n, dtype=bool)
+        G = gram[np.ix_(selected, selected)]
+        c = cross[selected]
+
+        for _ in range(max_iter):
+            free = np.flatnonzero(~pinned)
+            target, nu = _equality_qp(G, c, free)
+            step = target - w[free]
+
+            if np.abs(step).max() <= 1e-12:
+                # Stationary on the working set: check multipliers of the pinned stocks
+                gradient = 2 * G @ w - 2 * c
+                multipliers = np.where(pinned, gradient - nu, np.inf)
+                if multipliers.min() >= -tol * max(1.0, np.abs(gradient).max()):
+                    weights = np.zeros(gram.shape[0])
+                    weights[selected] = np.maximum(w, 0.0)
+                    return weights
+                pinned[int(np.argmin(multipliers))] = False
+                continue
+
+            # Longest step towards the target that keeps every free weight non-negative
+            shrinking = step < 0
+            ratios = np.full(len(free), np.inf)
+            ratios[shrinking] = -w[free][shrinking] / step[shrinking]
+            blocking = int(np.argmin(ratios))
+            alpha = min(1.0, ratios[blocking])
+
+            w[free] += alpha * step
+            if alpha < 1.0:
+                w[free[blocking]] = 0.0
+                pinned[free[blocking]] = True
+
+        raise ValueError("Active-set tracking QP did not converge")
+
+    except Exception as e:
+        logging.error(f"Error in solve_tracking_weights: {str(e)}")
+        raise
+
+def _track_pca_qp(factors, k, n_stocks):
+    # Select stocks by their loading on the factors that explain benchmark k, then fit weights by QP
+    loadings = np.abs(factors['component_weights'].to_numpy())
+    scores = loadings.dot(np.abs(factors['factor_betas'][:, k]) * factors['explained_variance'])
+    selected = np.argsort(scores)[::-1][:n_stocks]
+
+    return solve_tracking_weights(factors['gram'], factors['cross'][:, k], selected)
+
+def _track_ampl(returns, benchmarks, columns, n_stocks, model_path, solver):
+    # Each worker builds one AMPL instance and only swaps the benchmark param per solve
+    import amplpy
+
+    ampl = amplpy.AMPL()
+    ampl.setOption("solver", solver)
+    ampl.read(model_path)
+
+    stocks = list(returns.symbols)
+    periods = list(range(1, len(returns) + 1))
+    ampl.getSet("STOCKS").setValues(stocks)
+    ampl.getSet("T").setValues(periods)
+    ampl.getParameter("returns").setValues({
+        (s, t): float(v)
+        for j, s in enumerate(stocks)
+        for t, v in zip(periods, returns.values[:, j])
+    })
+    ampl.getParameter("q").set(n_stocks)
+
+    results = {}
+    for name in columns:
+        ampl.getParameter("benchmark").setValues(dict(zip(periods, benchmarks[name].astype(float))))
+        ampl.solve()
+        logging.info(f"AMPL solve status for {name}: {ampl.getValue('solve_result')}")
+
+        x = ampl.getVariable("x")
+        results[name] = np.array([x[s].value() for s in stocks])
+
+    ampl.close()
+    return results
+
+def track_benchmarks(returns, benchmarks, method='pca', n_stocks=10, n_components=10,
+                     max_workers=None, model_path='data/ampl/sp100_tracking.mod', solver='ipopt'):
+    """
+    Track K benchmarks in one run, sharing the stock factorizations across all of them
+
+    method is one of:
+      'pca_qp' - stocks ranked by their loadings on the PCs that explain each benchmark,
+                 weighted by a non-negative least-squares tracking QP
+      'ampl'   - the AMPL tracking model solved per benchmark
+      'pca'    - baseline only: the single importance-score portfolio of
+                 pca_approach.construct_portfolio, which ignores the benchmark
+
+    Returns a (stocks x benchmarks) weight DataFrame and a per-benchmark performance
+    dict; for 'pca' the weights have one 'baseline' column, evaluated against every benchmark
+    """
+    try:
+        returns, benchmarks = align_batch(returns, benchmarks)
+        names = list(benchmarks.columns)
+        max_workers = max_workers or min(len(names), os.cpu_count() or 1)
+
+        if method == 'pca':
+            # One benchmark-independent portfolio, so only the stock PCA is needed
+            component_weights, explained_variance, _ = apply_pca(returns, n_components)
+            weights = construct_portfolio(component_weights, explained_variance, n_stocks)
+            weights = weights.reindex(returns.symbols, fill_value=0.0).to_frame('baseline')
+
+        elif method == 'pca_qp':
+            factors = prepare_shared_factors(returns, benchmarks, n_components)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                solved = list(executor.map(lambda k: _track_pca_qp(factors, k, n_stocks), range(len(names))))
+            weights = pd.DataFrame(np.column_stack(solved), index=returns.symbols, columns=names)
+
+        elif method == 'ampl':
+            # Split benchmarks into one chunk per worker so each AMPL instance is reused
+            chunks = [names[i::max_workers] for i in range(max_workers)]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(_track_ampl, returns, benchmarks, chunk, n_stocks, model_path, solver)
+                    for chunk in chunks if chunk
+                ]
+                solved = {}
+                for future in futures:
+                    solved.update(future.result())
+            weights = pd.DataFrame(solved, index=returns.symbols)[names]
+
+        else:
+            raise ValueError(f"Unknown tracking method: {method}")
+
+        # Portfolio returns for all benchmarks in one product over the held stocks only
+        held = weights.index[(weights != 0).any(axis=1)]
+        portfolio_returns = pd.DataFrame(
+            returns.values[:, returns.symbol_positions(held)].astype(np.float64) @ weights.loc[held].to_numpy(),
+            index=returns.dates, columns=weights.columns
+        )
+
+        performance = {
+            name: evaluate_performance(portfolio_returns[name if name in weights else 'baseline'], benchmarks[name])
+            for name in names
+        }
+
+        logging.info(f"Tracked {len(names)} benchmarks with {method.upper()}")
+
+        return weights, performance
+
+    except Exception as e:
+        logging.error(f"Error in track_benchmarks: {str(e)}")
+        raise
+
+def save_batch_results(weights, performance, method_name):
+    """
+    Save per-benchmark weights and metrics tables
+    """
+    try:
+        os.makedirs('results', exist_ok=True)
+
+        weights_path = f'results/{method_name.lower()}_batch_weights.csv'
+        weights.to_csv(weights_path)
+
+        metrics_df = pd.concat(
+            {name: pd.DataFrame(metrics).T for name, metrics in performance.items()},
+            names=['benchmark', 'period']
+        )
+        metrics_path = f'results/{method_name.lower()}_batch_performance.csv'
+        metrics_df.to_csv(metrics_path)
+
+        logging.info(f"Batch results saved to {weights_path} and {metrics_path}")
+
+    except Exception as e:
+        logging.error(f"Error in save_batch_results: {str(e)}")
+        raise
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Track many benchmarks with shared stock factorizations')
+    parser.add_argument('--raw-path', default='data/raw/stock_data.csv')
+    parser.add_argument('--benchmark-path', default='data/processed/benchmark_returns.csv',
+                        help='OEX returns, added to the matrix as the OEX column')
+    parser.add_argument('--benchmarks-path', default='data/processed/benchmark_matrix.csv',
+                        help='Wide benchmark matrix; built from the sector map when missing')
+    parser.add_argument('--sectors-path', default='data/raw/sectors.csv')
+    parser.add_argument('--market-caps-path', default=None,
+                        help='CSV of symbol,market_cap for cap-weighted sub-indices (equal-weighted otherwise)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the benchmark matrix even if it exists')
+    parser.add_argument('--methods', nargs='+', default=['pca_qp'], choices=['pca', 'pca_qp', 'ampl'])
+    parser.add_argument('--n-stocks', type=int, default=10)
+    parser.add_argument('--n-components', type=int, default=10)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+        os.makedirs('results', exist_ok=True)
+
+        # Load stock prices and returns
+        prices = load_data(args.raw_path)
+        returns = calculate_returns(prices)
+
+        # Load the benchmark matrix, building the sector sub-indices plus OEX if needed
+        if args.rebuild or not os.path.exists(args.benchmarks_path):
+            benchmark_returns = load_benchmark_returns(args.benchmark_path)
+
+            market_caps = None
+            if args.market_caps_path:
+                market_caps = pd.read_csv(args.market_caps_path).set_index('symbol')['market_cap']
+
+            build_benchmark_matrix(prices, load_sector_map(args.sectors_path), benchmark_returns,
+                                   market_caps, args.benchmarks_path)
+        benchmarks = load_benchmark_matrix(args.benchmarks_path)
+
+        for method in args.methods:
+            weights, performance = track_benchmarks(returns, benchmarks, method=method,
+                                                    n_stocks=args.n_stocks, n_components=args.n_components)
+            save_batch_results(weights, performance, method.upper())
+
+            for name, metrics in performance.items():
+                logging.info(f"{method.upper()} {name} 3M Tracking Error: {metrics['3M']['tracking_error']:.4f}")
+
+        logging.info("Batch tracking completed successfully")
+
+    except Exception as e:
+        logging.error(f"Error in main: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import logging
 import os
 from generate_data import get_sp100_symbols, get_stock_data, calculate_returns
+from returns_panel import ReturnsPanel
 
 # Set up logging configuration
 logging.basicConfig(
@@ -12,12 +13,12 @@ logging.basicConfig(
 )
 
 class DataProcessor:
-    def __init__(self):
-        # Initialize data processor
+    def __init__(self, processed_data=None):
+        # Initialize data processor; processed_data may be a returns DataFrame or a ReturnsPanel
         self.raw_data = None
-        self.processed_data = None
+        self.processed_data = processed_data
         
-    def fetch_and_process_data(self):
+    def fetch_and_process_data(self, as_panel=False):
         # Fetch and process data using generate_data functions
         try:
             # Get stock symbols and set date range
@@ -28,6 +29,8 @@ class DataProcessor:
             # Get stock data
             prices = get_stock_data(symbols, start_date, end_date)
             returns = calculate_returns(prices)
+            if as_panel:
+                returns = ReturnsPanel.from_frame(returns)
             
             # Store processed data
             self.processed_data = returns
@@ -45,7 +48,10 @@ class DataProcessor:
             if self.processed_data is None:
                 raise ValueError("No data available. Call fetch_and_process_data first.")
                 
-            stats = self.processed_data.agg(['mean', 'std', 'min', 'max']).round(4)
+            if isinstance(self.processed_data, ReturnsPanel):
+                stats = self.processed_data.describe().round(4)
+            else:
+                stats = self.processed_data.agg(['mean', 'std', 'min', 'max']).round(4)
             
             logging.info("Statistics calculated successfully")
             return stats
@@ -60,14 +66,18 @@ class DataProcessor:
             if self.processed_data is None:
                 raise ValueError("No data available. Call fetch_and_process_data first.")
                 
+            if isinstance(self.processed_data, ReturnsPanel):
+                dates, symbols = self.processed_data.dates, self.processed_data.symbols
+                missing_values = int((~self.processed_data.valid).sum())
+            else:
+                dates, symbols = self.processed_data.index, self.processed_data.columns
+                missing_values = self.processed_data.isnull().sum().sum()
+            
             summary = {
-                'total_stocks': len(self.processed_data.columns),
-                'date_range': (
-                    self.processed_data.index.min(),
-                    self.processed_data.index.max()
-                ),
-                'total_days': len(self.processed_data),
-                'missing_values': self.processed_data.isnull().sum().sum()
+                'total_stocks': len(symbols),
+                'date_range': (dates.min(), dates.max()),
+                'total_days': len(dates),
+                'missing_values': missing_values
             }
             
             logging.info("Summary generated successfully")
@@ -78,13 +88,16 @@ class DataProcessor:
             raise
             
     def save_processed_data(self, output_path):
-        # Save processed data to CSV
+        # Save processed data to CSV, or a panel as .npy blocks in the output_path directory
         try:
             if self.processed_data is None:
                 raise ValueError("No data available. Call fetch_and_process_data first.")
                 
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            self.processed_data.to_csv(output_path)
+            if isinstance(self.processed_data, ReturnsPanel):
+                self.processed_data.save(output_path)
+            else:
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                self.processed_data.to_csv(output_path)
             logging.info(f"Processed data saved to {output_path}")
             
         except Exception as e:
@@ -1,7 +1,10 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
+import argparse
+import os
 from datetime import datetime, timedelta
+from returns_panel import ReturnsPanel
 
 def get_sp100_symbols():
     # Use complete S&P 100 component stock list
@@ -16,22 +19,45 @@ def get_sp100_symbols():
             'SCHW', 'SO', 'SPG', 'T', 'TGT', 'TMO', 'TMUS', 'TSLA', 'TXN', 'UNH', 'UNP', 
             'UPS', 'USB', 'V', 'VZ', 'WFC', 'WMT', 'XOM']
 
-def get_stock_data(symbols, start_date, end_date):
+# How far back Yahoo serves each intraday interval (days, with a day of margin)
+MAX_BAR_DAYS = {'1m': 29, '2m': 59, '5m': 59, '15m': 59, '30m': 59, '90m': 59, '60m': 729, '1h': 729}
+
+def get_stock_data(symbols, start_date, end_date, interval='1d'):
     data = pd.DataFrame()
     for symbol in symbols:
         try:
             stock = yf.Ticker(symbol)
-            hist = stock.history(start=start_date, end=end_date)
+            hist = stock.history(start=start_date, end=end_date, interval=interval)
             if not hist.empty:
                 data[symbol] = hist['Close']
         except Exception as e:
             print(f"Error fetching data for {symbol}: {str(e)}")
     return data
 
+def write_stock_bars(symbols, start_date, end_date, output_file, interval='5m', window_days=5, benchmark='^OEX'):
+    # Download bars window by window and append them to a wide CSV so the full
+    # intraday panel is never held in memory; the benchmark index is one more column
+    symbols = list(symbols) + ([benchmark] if benchmark and benchmark not in symbols else [])
+    header = True
+    window_start = start_date
+    while window_start < end_date:
+        window_end = min(window_start + timedelta(days=window_days), end_date)
+        bars = get_stock_data(symbols, window_start, window_end, interval=interval)
+        if not bars.empty:
+            # Keep a fixed column layout even when a symbol has no bars in this window
+            bars = bars.reindex(columns=symbols)
+            bars.index.name = 'date'
+            bars.to_csv(output_file, mode='w' if header else 'a', header=header)
+            header = False
+        window_start = window_end
+
 def calculate_returns(prices):
     return prices.pct_change().dropna()
 
-def generate_ampl_data(returns, benchmark_returns, output_file):
+def generate_ampl_data(returns, benchmark_returns, output_file, q=10):
+    if isinstance(returns, ReturnsPanel):
+        return generate_ampl_data_from_panel(returns, benchmark_returns, output_file, q)
+
     with open(output_file, 'w') as f:
         # Write stock set
         f.write('set STOCKS := ' + ' '.join(returns.columns) + ';\n\n')
@@ -41,7 +67,7 @@ def generate_ampl_data(returns, benchmark_returns, output_file):
         f.write('set T := ' + ' '.join(map(str, time_periods)) + ';\n\n')
         
         # Write parameter q (number of stocks to select)
-        f.write('param q := 10;\n\n')
+        f.write(f'param q := {q};\n\n')
         
         # Write returns data
         f.write('param returns :=\n')
@@ -58,7 +84,66 @@ def generate_ampl_data(returns, benchmark_returns, output_file):
                 f.write(f'{t} {ret:.6f}\n')
         f.write(';\n')
 
-def main():
+def generate_ampl_data_from_panel(panel, benchmark_returns, output_file, q=10):
+    # Same .dat layout as generate_ampl_data, written straight from the panel block
+    with open(output_file, 'w') as f:
+        f.write('set STOCKS := ' + ' '.join(panel.symbols) + ';\n\n')
+        f.write('set T := ' + ' '.join(map(str, range(1, len(panel) + 1))) + ';\n\n')
+        f.write(f'param q := {q};\n\n')
+        
+        # Only valid cells are written, as with the NaN check in generate_ampl_data
+        f.write('param returns :=\n')
+        rows, cols = np.nonzero(panel.valid)
+        for t, j in zip(rows, cols):
+            f.write(f'{panel.symbols[j]} {t + 1} {panel.values[t, j]:.6f}\n')
+        f.write(';\n\n')
+        
+        f.write('param benchmark :=\n')
+        for t, ret in enumerate(panel.align(benchmark_returns), 1):
+            if not np.isnan(ret):
+                f.write(f'{t} {ret:.6f}\n')
+        f.write(';\n')
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Download S&P 100 data')
+    parser.add_argument('--interval', default=None,
+                        help='Write intraday bars at this interval (e.g. 5m) instead of the daily AMPL data')
+    parser.add_argument('--bars-path', default=None, help='Defaults to data/raw/stock_bars_<interval>.csv')
+    parser.add_argument('--symbols-path', default='data/raw/stock_data.csv',
+                        help='Long-format price file whose symbols make up the bar universe')
+    parser.add_argument('--days', type=int, default=None,
+                        help='Days of bars to download; defaults to the most Yahoo serves for the interval')
+    parser.add_argument('--benchmark', default='^OEX')
+    return parser.parse_args(argv)
+
+def write_bars(args):
+    # Bars for the same universe the pipeline optimizes over, plus the benchmark column
+    if os.path.exists(args.symbols_path):
+        symbols = sorted(pd.read_csv(args.symbols_path, usecols=['symbol'])['symbol'].astype(str).unique())
+    else:
+        symbols = get_sp100_symbols()
+
+    output_file = args.bars_path or f'data/raw/stock_bars_{args.interval}.csv'
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+
+    max_days = MAX_BAR_DAYS.get(args.interval)
+    days = args.days or max_days or 365
+    if max_days is not None and days > max_days:
+        print(f"Yahoo only serves {args.interval} bars for the last ~{max_days + 1} days; using {max_days} instead of {days}")
+        days = max_days
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    write_stock_bars(symbols, start_date, end_date, output_file, interval=args.interval, benchmark=args.benchmark)
+
+    print(f"Bars written to {output_file}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.interval:
+        write_bars(args)
+        return
+
     # Set time range
     end_date = datetime.now()
     start_date = end_date - timedelta(days=365)
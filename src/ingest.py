@@ -0,0 +1,165 @@
+import pandas as pd
+import numpy as np
+import argparse
+import logging
+import os
+from returns_panel import ReturnsPanel, utc_nanoseconds
+
+# Set up logging configuration
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+RETURN_KINDS = ('simple', 'log')
+
+def scan_labels(path, chunksize=500000, date_column='date', symbol_column='symbol'):
+    """
+    First pass over a long-format file: collect the sorted unique dates and symbols
+    """
+    try:
+        dates = set()
+        symbols = set()
+
+        for chunk in pd.read_csv(path, usecols=[date_column, symbol_column], chunksize=chunksize):
+            dates.update(np.unique(utc_nanoseconds(pd.to_datetime(chunk[date_column], utc=True))))
+            symbols.update(chunk[symbol_column].astype(str).unique())
+
+        return np.array(sorted(dates), dtype=np.int64), sorted(symbols)
+
+    except Exception as e:
+        logging.error(f"Error in scan_labels: {str(e)}")
+        raise
+
+def _open_blocks(output_dir, shape, dtype):
+    # Disk-backed (memory-mapped) value and validity blocks for each return kind
+    blocks = {}
+    for kind in RETURN_KINDS:
+        directory = os.path.join(output_dir, kind)
+        os.makedirs(directory, exist_ok=True)
+        values = np.lib.format.open_memmap(os.path.join(directory, 'values.npy'), mode='w+', dtype=dtype, shape=shape)
+        valid = np.lib.format.open_memmap(os.path.join(directory, 'valid.npy'), mode='w+', dtype=np.bool_, shape=shape)
+        blocks[kind] = (values, valid)
+    return blocks
+
+def ingest_raw(path='data/raw/stock_data.csv', output_dir='data/processed/panel', price_column='Close',
+               chunksize=500000, dtype=np.float32, date_column='date', symbol_column='symbol'):
+    """
+    Stream a long-format price file into on-disk wide simple and log return panels
+
+    New rows for each symbol must arrive in date order (symbols may be
+    interleaved). Duplicate (date, symbol) rows, including repeated blocks
+    later in the file, keep the first occurrence, and the last price
+    of every symbol is carried across chunk boundaries so no return is lost.
+    Only one chunk plus the date/symbol labels is held in memory; the panels
+    are written straight into memory-mapped .npy files under output_dir.
+    """
+    try:
+        dates, symbols = scan_labels(path, chunksize, date_column, symbol_column)
+        date_index = pd.Index(dates)
+        symbol_positions = {symbol: i for i, symbol in enumerate(symbols)}
+
+        blocks = _open_blocks(output_dir, (len(dates), len(symbols)), dtype)
+
+        # Disk-backed record of ingested (date, symbol) pairs for cross-chunk deduplication
+        seen_path = os.path.join(output_dir, 'seen.npy')
+        seen = np.lib.format.open_memmap(seen_path, mode='w+', dtype=np.bool_, shape=(len(dates), len(symbols)))
+
+        # symbol -> (last date in ns, last price)
+        last_price = {}
+        rows_read = 0
+
+        for chunk in pd.read_csv(path, usecols=[date_column, symbol_column, price_column], chunksize=chunksize):
+            rows_read += len(chunk)
+            chunk[date_column] = utc_nanoseconds(pd.to_datetime(chunk[date_column], utc=True))
+            chunk[symbol_column] = chunk[symbol_column].astype(str)
+            chunk = chunk.drop_duplicates(subset=[date_column, symbol_column], keep='first')
+
+            for symbol, group in chunk.groupby(symbol_column, sort=False):
+                column = symbol_positions[symbol]
+                group_dates = group[date_column].to_numpy()
+                prices = group[price_column].to_numpy(dtype=np.float64)
+
+                # Drop (date, symbol) pairs already ingested from an earlier chunk
+                fresh = ~seen[date_index.get_indexer(group_dates), column]
+                group_dates, prices = group_dates[fresh], prices[fresh]
+                if len(group_dates) == 0:
+                    continue
+
+                previous = last_price.get(symbol)
+                if (np.diff(group_dates) <= 0).any() or (previous is not None and group_dates[0] <= previous[0]):
+                    raise ValueError(f"Rows for {symbol} are not in date order")
+                seen[date_index.get_indexer(group_dates), column] = True
+
+                # Prepend the price carried over from the previous chunk
+                if previous is not None:
+                    prices = np.concatenate([[previous[1]], prices])
+                    return_dates = group_dates
+                else:
+                    # The first row of a symbol only seeds its carried price
+                    return_dates = group_dates[1:]
+
+                last_price[symbol] = (group_dates[-1], prices[-1])
+                if len(return_dates) == 0:
+                    continue
+
+                rows = date_index.get_indexer(return_dates)
+
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    ratio = prices[1:] / prices[:-1]
+                    kinds = {'simple': ratio - 1, 'log': np.log(ratio)}
+
+                for kind, returns in kinds.items():
+                    values, valid = blocks[kind]
+                    finite = np.isfinite(returns)
+                    values[rows, column] = np.where(finite, returns, 0.0)
+                    valid[rows, column] = finite
+
+            # Push dirty pages to disk so resident memory stays bounded
+            seen.flush()
+            for values, valid in blocks.values():
+                values.flush()
+                valid.flush()
+
+        for kind in RETURN_KINDS:
+            directory = os.path.join(output_dir, kind)
+            np.save(os.path.join(directory, 'dates.npy'), dates)
+            np.save(os.path.join(directory, 'symbols.npy'), np.asarray(symbols, dtype=str))
+        del blocks, seen
+        os.remove(seen_path)
+
+        logging.info(f"Ingested {rows_read} rows into {len(dates)} dates x {len(symbols)} symbols at {output_dir}")
+
+        return {kind: ReturnsPanel.load(os.path.join(output_dir, kind)) for kind in RETURN_KINDS}
+
+    except Exception as e:
+        logging.error(f"Error in ingest_raw: {str(e)}")
+        raise
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Stream a long-format price file into wide return panels')
+    parser.add_argument('--raw-path', default='data/raw/stock_data.csv')
+    parser.add_argument('--output-dir', default='data/processed/panel')
+    parser.add_argument('--price-column', default='Close')
+    parser.add_argument('--chunksize', type=int, default=500000)
+    parser.add_argument('--float64', action='store_true', help='Store returns as float64 instead of float32')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+        dtype = np.float64 if args.float64 else np.float32
+
+        panels = ingest_raw(args.raw_path, args.output_dir, args.price_column, args.chunksize, dtype)
+
+        for kind, panel in panels.items():
+            logging.info(f"{kind} returns: shape {panel.shape}, missing cells {int((~panel.valid).sum())}")
+
+        logging.info("Ingest completed successfully")
+
+    except Exception as e:
+        logging.error(f"Error in main: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import pandas as pd
+import numpy as np
+import argparse
+import logging
+import os
+from returns_panel import ReturnsPanel
+from performance_metrics import bars_per_day, periods_per_year, evaluate_performance
+
+# Set up logging configuration
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+def read_bars(path, chunksize=100000, columns=None):
+    """
+    Read a wide bar file (date column plus one close column per symbol) as a generator of chunks
+
+    With columns, only those symbol columns are parsed (in that order), so
+    gaps in unrelated symbols never reach the returns
+    """
+    try:
+        usecols = None if columns is None else ['date'] + list(columns)
+        for chunk in pd.read_csv(path, index_col='date', usecols=usecols, chunksize=chunksize):
+            if columns is not None:
+                chunk = chunk[list(columns)]
+            chunk.index = pd.to_datetime(chunk.index, utc=True)
+            yield chunk
+
+    except Exception as e:
+        logging.error(f"Error in read_bars: {str(e)}")
+        raise
+
+def stream_returns(bar_chunks):
+    """
+    Turn a stream of price chunks into a stream of return chunks, carrying the
+    last bar across chunk boundaries so no return is lost between chunks
+    """
+    try:
+        last_bar = None
+        for prices in bar_chunks:
+            if prices.empty:
+                continue
+
+            if last_bar is not None:
+                returns = (prices / pd.concat([last_bar, prices.iloc[:-1]]).to_numpy() - 1)
+            else:
+                returns = (prices / prices.shift(1) - 1).iloc[1:]
+
+            last_bar = prices.iloc[[-1]]
+            yield returns.dropna()
+
+    except Exception as e:
+        logging.error(f"Error in stream_returns: {str(e)}")
+        raise
+
+class StreamingTracker:
+    def __init__(self, weights, benchmark_column, frequency='1d', risk_free_rate=0.02):
+        # Fixed portfolio weights tracked against one benchmark column of the bar stream
+        self.weights = weights
+        self.benchmark_column = benchmark_column
+        self.frequency = frequency
+        self.risk_free_rate = risk_free_rate
+
+        # Running count, means and co-moment matrix of (portfolio, benchmark) returns
+        self.n = 0
+        self.mean = np.zeros(2)
+        self.m2 = np.zeros((2, 2))
+
+        # Only the trailing year of bars is kept for the period metrics
+        self.max_bars = 252 * bars_per_day(frequency)
+        self.portfolio_tail = pd.Series(dtype=float)
+        self.benchmark_tail = pd.Series(dtype=float)
+
+    def update(self, returns):
+        # Fold one chunk of bar returns (DataFrame or ReturnsPanel) into the running statistics
+        if isinstance(returns, ReturnsPanel):
+            portfolio_returns = returns.portfolio_returns(self.weights)
+            column = returns.symbol_positions([self.benchmark_column])[0]
+            benchmark_returns = pd.Series(returns.values[:, column].astype(np.float64), index=returns.dates)
+        else:
+            portfolio_returns = returns[self.weights.index].dot(self.weights)
+            benchmark_returns = returns[self.benchmark_column]
+
+        pair = np.column_stack([portfolio_returns.to_numpy(), benchmark_returns.to_numpy()])
+        if len(pair) == 0:
+            return
+
+        # Chan et al. parallel merge of chunk moments into the running moments
+        n_chunk = len(pair)
+        mean_chunk = pair.mean(axis=0)
+        centered = pair - mean_chunk
+        m2_chunk = centered.T @ centered
+
+        total = self.n + n_chunk
+        delta = mean_chunk - self.mean
+        self.mean = self.mean + delta * n_chunk / total
+        self.m2 = self.m2 + m2_chunk + np.outer(delta, delta) * self.n * n_chunk / total
+        self.n = total
+
+        self.portfolio_tail = pd.concat([self.portfolio_tail, portfolio_returns]).iloc[-self.max_bars:]
+        self.benchmark_tail = pd.concat([self.benchmark_tail, benchmark_returns]).iloc[-self.max_bars:]
+
+    def full_sample_metrics(self):
+        # Whole-history metrics from the running moments
+        annualization = periods_per_year(self.frequency)
+        cov = self.m2 / (self.n - 1)
+
+        excess_mean = self.mean[0] - self.mean[1]
+        excess_var = cov[0, 0] + cov[1, 1] - 2 * cov[0, 1]
+        tracking_error = np.sqrt(max(excess_var, 0) * annualization)
+        information_ratio = excess_mean * annualization / tracking_error if tracking_error > 0 else 0
+        volatility = np.sqrt(cov[0, 0] * annualization)
+
+        return {
+            'correlation': cov[0, 1] / np.sqrt(cov[0, 0] * cov[1, 1]),
+            'tracking_error': tracking_error,
+            'information_ratio': information_ratio,
+            'sharpe_ratio': (self.mean[0] * annualization - self.risk_free_rate) / volatility
+        }
+
+    def performance(self):
+        # Trailing 3M/6M/9M/1Y metrics plus full-sample metrics
+        if self.n < 2:
+            raise ValueError("Not enough bars to evaluate performance")
+
+        performance = evaluate_performance(self.portfolio_tail, self.benchmark_tail, self.frequency)
+        performance['Full'] = self.full_sample_metrics()
+        return performance
+
+def evaluate_bars(path, weights, benchmark_column, frequency='5m', chunksize=100000):
+    """
+    Evaluate tracking on a bar file in a single streaming pass
+    """
+    try:
+        tracker = StreamingTracker(weights, benchmark_column, frequency)
+
+        # Only the held stocks and the benchmark matter; a bar is dropped only when one of them is missing
+        columns = list(dict.fromkeys(list(map(str, weights.index)) + [benchmark_column]))
+
+        for returns in stream_returns(read_bars(path, chunksize, columns)):
+            tracker.update(returns)
+
+        logging.info(f"Processed {tracker.n} {frequency} bars from {path}")
+
+        return tracker.performance()
+
+    except Exception as e:
+        logging.error(f"Error in evaluate_bars: {str(e)}")
+        raise
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluate portfolio tracking on intraday bars')
+    parser.add_argument('--bars-path', default='data/raw/stock_bars_5m.csv')
+    parser.add_argument('--frequency', default='5m')
+    parser.add_argument('--weights-path', default='results/pipeline_weights.csv')
+    parser.add_argument('--method', default='PCA')
+    parser.add_argument('--benchmark-column', default='^OEX')
+    parser.add_argument('--chunksize', type=int, default=100000)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+
+        # Load the weights of one method and drop unselected stocks
+        weights = pd.read_csv(args.weights_path, index_col=0)[args.method].dropna()
+        weights = weights[weights > 0]
+
+        performance = evaluate_bars(args.bars_path, weights, args.benchmark_column,
+                                    args.frequency, args.chunksize)
+
+        os.makedirs('results', exist_ok=True)
+        output_path = f'results/{args.method.lower()}_{args.frequency}_performance.csv'
+        pd.DataFrame(performance).T.to_csv(output_path)
+
+        for period, metrics in performance.items():
+            logging.info(f"{period} Performance:")
+            logging.info(f"  Correlation: {metrics['correlation']:.4f}")
+            logging.info(f"  Tracking Error: {metrics['tracking_error']:.4f}")
+            logging.info(f"  Information Ratio: {metrics['information_ratio']:.4f}")
+
+        logging.info(f"Intraday performance saved to {output_path}")
+
+    except Exception as e:
+        logging.error(f"Error in main: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
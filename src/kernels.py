@@ -0,0 +1,301 @@
+import numpy as np
+import logging
+
+# Numba is optional: without it every kernel falls back to a vectorized NumPy version
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Set to False to force the NumPy kernels even when Numba is installed
+USE_JIT = NUMBA_AVAILABLE
+
+def _shift(x):
+    # Reference value subtracted before summing, to limit cancellation in the running sums
+    finite = x[~np.isnan(x)]
+    return finite[0] if len(finite) else 0.0
+
+def _window_sums(a, window):
+    """
+    Sum over every trailing window in O(n), NaN for the first window - 1 positions
+
+    Cumulative sums restart every window elements, so each window sum is a
+    block suffix plus the next block's prefix and rounding error stays at the
+    scale of two windows instead of growing with the length of the series.
+    """
+    n = len(a)
+    if n < window:
+        return np.full(n, np.nan)
+    n_blocks = -(-n // window)
+    blocks = np.zeros(n_blocks * window)
+    blocks[:n] = a
+    prefix = np.cumsum(blocks.reshape(n_blocks, window), axis=1)
+
+    sums = np.full(prefix.shape, np.nan)
+    sums[0, -1] = prefix[0, -1]
+    sums[1:] = (prefix[:-1, -1:] - prefix[:-1]) + prefix[1:]
+    return sums.ravel()[:n]
+
+def _constant_run(x):
+    # Length of the run of identical values ending at each position
+    n = len(x)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = x[1:] != x[:-1]
+    positions = np.arange(n)
+    return positions - np.maximum.accumulate(np.where(starts, positions, 0)) + 1
+
+def _rolling_mean_numpy(x, window):
+    if len(x) < window:
+        return np.full(len(x), np.nan)
+    missing = np.isnan(x)
+    shift = _shift(x)
+    mean = _window_sums(np.where(missing, 0.0, x - shift), window) / window + shift
+    mean[_window_sums(missing.astype(np.float64), window) > 0] = np.nan
+    return mean
+
+def _rolling_var_numpy(x, window):
+    if len(x) < window or window < 2:
+        return np.full(len(x), np.nan)
+    missing = np.isnan(x)
+    centered = np.where(missing, 0.0, x - _shift(x))
+    s1 = _window_sums(centered, window)
+    s2 = _window_sums(centered * centered, window)
+    var = np.maximum((s2 - s1 * s1 / window) / (window - 1), 0.0)
+    # Like pandas, a window of identical values has exactly zero variance
+    var[_constant_run(x) >= window] = 0.0
+    var[_window_sums(missing.astype(np.float64), window) > 0] = np.nan
+    return var
+
+def _rolling_std_numpy(x, window):
+    return np.sqrt(_rolling_var_numpy(x, window))
+
+def _rolling_corr_numpy(x, y, window):
+    if len(x) < window or window < 2:
+        return np.full(len(x), np.nan)
+    missing = np.isnan(x) | np.isnan(y)
+    cx = np.where(missing, 0.0, x - _shift(x))
+    cy = np.where(missing, 0.0, y - _shift(y))
+    sx = _window_sums(cx, window)
+    sy = _window_sums(cy, window)
+    cov = _window_sums(cx * cy, window) - sx * sy / window
+    var_x = _window_sums(cx * cx, window) - sx * sx / window
+    var_y = _window_sums(cy * cy, window) - sy * sy / window
+    # Zero-variance windows have no defined correlation (NaN, as in pandas)
+    flat = (_constant_run(x) >= window) | (_constant_run(y) >= window) | (var_x <= 0) | (var_y <= 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / np.sqrt(var_x * var_y)
+    corr[flat] = np.nan
+    corr[_window_sums(missing.astype(np.float64), window) > 0] = np.nan
+    return corr
+
+def _drifted_backtest_numpy(returns, weights):
+    # Buy-and-hold: holdings grow with their own returns, so value is a cumulative product per stock
+    growth = np.cumprod(1 + returns, axis=0)
+    value = growth @ weights
+    previous = np.concatenate([[weights.sum()], value[:-1]])
+    return value / previous - 1
+
+def _candidate_tracking_errors_numpy(returns, benchmark, candidates, weights):
+    # Tracking error (sample std of excess returns) of each fixed-weight candidate set
+    errors = np.empty(len(candidates))
+    for c in range(len(candidates)):
+        excess = returns[:, candidates[c]] @ weights[c] - benchmark
+        errors[c] = excess.std(ddof=1)
+    return errors
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, error_model='numpy')
+    def _rolling_moments_jit(x, y, window, want_corr):
+        # One O(n) pass of running sums, adding the newest and removing the oldest
+        # observation; returns (mean of x, variance of x, correlation of x and y)
+        n = len(x)
+        mean = np.full(n, np.nan)
+        var = np.full(n, np.nan)
+        corr = np.full(n, np.nan)
+
+        shift_x = 0.0
+        shift_y = 0.0
+        for i in range(n):
+            if not np.isnan(x[i]):
+                shift_x = x[i]
+                break
+        for i in range(n):
+            if not np.isnan(y[i]):
+                shift_y = y[i]
+                break
+
+        sx = 0.0
+        sy = 0.0
+        sxx = 0.0
+        syy = 0.0
+        sxy = 0.0
+        n_missing = 0
+        run_x = 0
+        run_y = 0
+        for i in range(n):
+            missing = np.isnan(x[i]) or (want_corr and np.isnan(y[i]))
+            if missing:
+                n_missing += 1
+            else:
+                cx = x[i] - shift_x
+                cy = y[i] - shift_y
+                sx += cx
+                sy += cy
+                sxx += cx * cx
+                syy += cy * cy
+                sxy += cx * cy
+
+            run_x = run_x + 1 if i > 0 and x[i] == x[i - 1] else 1
+            run_y = run_y + 1 if i > 0 and y[i] == y[i - 1] else 1
+
+            if i >= window:
+                j = i - window
+                if np.isnan(x[j]) or (want_corr and np.isnan(y[j])):
+                    n_missing -= 1
+                else:
+                    cx = x[j] - shift_x
+                    cy = y[j] - shift_y
+                    sx -= cx
+                    sy -= cy
+                    sxx -= cx * cx
+                    syy -= cy * cy
+                    sxy -= cx * cy
+
+            # Rebuild the sums from scratch once per window so rounding error cannot accumulate (amortized O(1))
+            if (i + 1) % window == 0:
+                sx = 0.0
+                sy = 0.0
+                sxx = 0.0
+                syy = 0.0
+                sxy = 0.0
+                n_missing = 0
+                for j in range(i - window + 1, i + 1):
+                    if np.isnan(x[j]) or (want_corr and np.isnan(y[j])):
+                        n_missing += 1
+                    else:
+                        cx = x[j] - shift_x
+                        cy = y[j] - shift_y
+                        sx += cx
+                        sy += cy
+                        sxx += cx * cx
+                        syy += cy * cy
+                        sxy += cx * cy
+
+            if i < window - 1 or n_missing > 0:
+                continue
+
+            mean[i] = sx / window + shift_x
+            if window < 2:
+                continue
+
+            var_x = max((sxx - sx * sx / window) / (window - 1), 0.0)
+            if run_x >= window:
+                var_x = 0.0
+            var[i] = var_x
+
+            if want_corr:
+                cov = sxy - sx * sy / window
+                ss_x = sxx - sx * sx / window
+                ss_y = syy - sy * sy / window
+                if run_x < window and run_y < window and ss_x > 0 and ss_y > 0:
+                    corr[i] = cov / np.sqrt(ss_x * ss_y)
+
+        return mean, var, corr
+
+    @njit(cache=True, error_model='numpy')
+    def _drifted_backtest_jit(returns, weights):
+        n, m = returns.shape
+        holdings = weights.copy()
+        out = np.empty(n)
+        value = holdings.sum()
+        for t in range(n):
+            new_value = 0.0
+            for i in range(m):
+                holdings[i] *= 1 + returns[t, i]
+                new_value += holdings[i]
+            out[t] = new_value / value - 1
+            value = new_value
+        return out
+
+    # Serial on purpose: the pipeline calls this from worker threads, where Numba's
+    # TBB threading layer can hang the interpreter at exit
+    @njit(cache=True, error_model='numpy')
+    def _candidate_tracking_errors_jit(returns, benchmark, candidates, weights):
+        n = len(benchmark)
+        n_candidates, q = candidates.shape
+        errors = np.empty(n_candidates)
+        for c in range(n_candidates):
+            excess = np.empty(n)
+            for t in range(n):
+                total = 0.0
+                for k in range(q):
+                    total += returns[t, candidates[c, k]] * weights[c, k]
+                excess[t] = total - benchmark[t]
+            mean = excess.mean()
+            ss = 0.0
+            for t in range(n):
+                ss += (excess[t] - mean) ** 2
+            errors[c] = np.sqrt(ss / (n - 1))
+        return errors
+
+def _as_float(x):
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+def rolling_mean(x, window):
+    # Trailing-window mean; NaN for the first window - 1 positions and any window containing NaN
+    x = _as_float(x)
+    if USE_JIT:
+        return _rolling_moments_jit(x, x, window, False)[0]
+    return _rolling_mean_numpy(x, window)
+
+def rolling_std(x, window):
+    # Trailing-window sample standard deviation (ddof=1), same NaN rules as rolling_mean
+    x = _as_float(x)
+    if USE_JIT:
+        return np.sqrt(_rolling_moments_jit(x, x, window, False)[1])
+    return _rolling_std_numpy(x, window)
+
+def rolling_corr(x, y, window):
+    # Trailing-window Pearson correlation of two aligned arrays; NaN for zero-variance windows
+    x, y = _as_float(x), _as_float(y)
+    if USE_JIT:
+        return _rolling_moments_jit(x, y, window, True)[2]
+    return _rolling_corr_numpy(x, y, window)
+
+def drifted_backtest(returns, weights):
+    """
+    Per-period returns of a buy-and-hold portfolio whose weights drift with
+    prices, starting from the given weights (returns is periods x stocks)
+    """
+    try:
+        returns, weights = _as_float(returns), _as_float(weights)
+        if USE_JIT:
+            return _drifted_backtest_jit(returns, weights)
+        return _drifted_backtest_numpy(returns, weights)
+
+    except Exception as e:
+        logging.error(f"Error in drifted_backtest: {str(e)}")
+        raise
+
+def candidate_tracking_errors(returns, benchmark, candidates, weights=None):
+    """
+    Tracking error of many candidate stock sets in one call
+
+    candidates is an (n_candidates x q) array of column positions into returns;
+    weights has the same shape and defaults to equal weights
+    """
+    try:
+        returns, benchmark = _as_float(returns), _as_float(benchmark)
+        candidates = np.ascontiguousarray(candidates, dtype=np.intp)
+        if weights is None:
+            weights = np.full(candidates.shape, 1.0 / candidates.shape[1])
+        weights = _as_float(weights)
+
+        if USE_JIT:
+            return _candidate_tracking_errors_jit(returns, benchmark, candidates, weights)
+        return _candidate_tracking_errors_numpy(returns, benchmark, candidates, weights)
+
+    except Exception as e:
+        logging.error(f"Error in candidate_tracking_errors: {str(e)}")
+        raise
@@ -8,6 +8,9 @@ from datetime import datetime, timedelta
 import pytz
 import logging
 import os
+from returns_panel import ReturnsPanel
+from kernels import candidate_tracking_errors
+from solution_cache import SolutionCache, solution_key, problem_family
 from performance_metrics import calculate_correlation, evaluate_performance, save_performance_metrics, load_performance_metrics, compare_methods, log_comparison_results
 
 # Set up logging configuration
@@ -20,13 +23,13 @@ logging.basicConfig(
 plt.style.use('default')
 sns.set_theme()
 
-def load_data():
+def load_data(path='data/raw/stock_data.csv'):
     """
     Load and preprocess data
     """
     try:
-        df = pd.read_csv('data/raw/stock_data.csv')
-        df['date'] = pd.to_datetime(df['date'])
+        df = pd.read_csv(path)
+        df['date'] = pd.to_datetime(df['date'], utc=True)
         df = df.drop_duplicates(subset=['date', 'symbol'], keep='first')
         
         # Pivot the data
@@ -41,6 +44,19 @@ def load_data():
         logging.error(f"Error in load_data: {str(e)}")
         raise
 
+def load_benchmark_returns(path='data/processed/benchmark_returns.csv'):
+    """
+    Load the benchmark return series (dates parsed as UTC)
+    """
+    try:
+        benchmark_returns = pd.read_csv(path)
+        benchmark_returns['date'] = pd.to_datetime(benchmark_returns['date'], utc=True)
+        return benchmark_returns.set_index('date')['benchmark_return']
+        
+    except Exception as e:
+        logging.error(f"Error in load_benchmark_returns: {str(e)}")
+        raise
+
 def calculate_returns(prices):
     """
     Calculate daily returns
@@ -54,12 +70,19 @@ def calculate_returns(prices):
 
 def apply_pca(returns, n_components=10):
     """
-    Apply PCA to return data
+    Apply PCA to return data (a DataFrame or a ReturnsPanel)
     """
     try:
+        # Work on the raw block for panels; PCA needs complete rows
+        if isinstance(returns, ReturnsPanel):
+            returns = returns.dropna()
+            data, symbols = returns.values, returns.symbols
+        else:
+            data, symbols = returns, returns.columns
+        
         # Standardize returns
         scaler = StandardScaler()
-        scaled_returns = scaler.fit_transform(returns)
+        scaled_returns = scaler.fit_transform(data)
         
         # Apply PCA
         pca = PCA(n_components=n_components)
@@ -69,7 +92,7 @@ def apply_pca(returns, n_components=10):
         component_weights = pd.DataFrame(
             pca.components_.T,
             columns=[f'PC{i+1}' for i in range(n_components)],
-            index=returns.columns
+            index=symbols
         )
         
         # Calculate explained variance ratio
@@ -81,16 +104,82 @@ def apply_pca(returns, n_components=10):
         logging.error(f"Error in apply_pca: {str(e)}")
         raise
 
-def construct_portfolio(component_weights, explained_variance, n_stocks=10):
+def search_selection(importance_scores, returns, benchmark_returns, n_stocks=10, n_candidates=20):
+    """
+    Greedy swap search: starting from the top n_stocks by importance, repeatedly
+    swap one holding for one of the next n_candidates stocks while that lowers
+    the tracking error of the importance-weighted portfolio
+    """
+    try:
+        # Returns block and benchmark aligned on the same dates
+        if isinstance(returns, ReturnsPanel):
+            data, symbols = returns.values, returns.symbols
+            benchmark = returns.align(benchmark_returns)
+        else:
+            common_index = returns.index.intersection(benchmark_returns.index)
+            data, symbols = returns.loc[common_index].to_numpy(), returns.columns
+            benchmark = benchmark_returns.loc[common_index].to_numpy(dtype=float)
+        rows = ~np.isnan(benchmark)
+        data, benchmark = data[rows], benchmark[rows]
+        
+        ranked = importance_scores.sort_values(ascending=False)
+        ranked = ranked[ranked.index.isin(symbols)]
+        positions = {symbol: i for i, symbol in enumerate(map(str, symbols))}
+        columns = np.array([positions[str(symbol)] for symbol in ranked.index])
+        scores = ranked.to_numpy()
+        
+        selected = list(range(n_stocks))
+        pool = list(range(n_stocks, min(n_stocks + n_candidates, len(ranked))))
+        
+        def evaluate(sets):
+            sets = np.array(sets)
+            weights = scores[sets] / scores[sets].sum(axis=1, keepdims=True)
+            return candidate_tracking_errors(data, benchmark, columns[sets], weights)
+        
+        best_error = evaluate([selected])[0]
+        for _ in range(n_stocks):
+            swaps = [(i, j) for i in range(n_stocks) for j in pool]
+            if not swaps:
+                break
+            sets = []
+            for i, j in swaps:
+                candidate = list(selected)
+                candidate[i] = j
+                sets.append(candidate)
+            errors = evaluate(sets)
+            best = int(np.argmin(errors))
+            if errors[best] >= best_error:
+                break
+            i, j = swaps[best]
+            pool[pool.index(j)] = selected[i]
+            selected[i] = j
+            best_error = errors[best]
+        
+        logging.info(f"Selection search tracking error: {best_error:.6f}")
+        
+        return ranked.index[selected]
+        
+    except Exception as e:
+        logging.error(f"Error in search_selection: {str(e)}")
+        raise
+
+def construct_portfolio(component_weights, explained_variance, n_stocks=10,
+                        returns=None, benchmark_returns=None, n_candidates=0):
     """
     Construct investment portfolio based on PCA components
+    
+    With returns, a benchmark and n_candidates > 0 the top-n selection is
+    refined by a swap search over the next n_candidates stocks
     """
     try:
         # Calculate importance scores for each stock
         importance_scores = np.abs(component_weights).dot(explained_variance)
         
         # Select top n_stocks stocks
-        selected_stocks = importance_scores.nlargest(n_stocks).index
+        if n_candidates and returns is not None and benchmark_returns is not None:
+            selected_stocks = search_selection(importance_scores, returns, benchmark_returns, n_stocks, n_candidates)
+        else:
+            selected_stocks = importance_scores.nlargest(n_stocks).index
         
         # Calculate weights based on importance scores
         weights = importance_scores[selected_stocks]
@@ -102,6 +191,34 @@ def construct_portfolio(component_weights, explained_variance, n_stocks=10):
         logging.error(f"Error in construct_portfolio: {str(e)}")
         raise
 
+def pca_portfolio(returns, n_components=10, n_stocks=10, cache=None):
+    """
+    Apply PCA and construct the portfolio, reusing a cached solution for an identical returns window
+    """
+    try:
+        symbols = returns.symbols if isinstance(returns, ReturnsPanel) else returns.columns
+        options = {'n_components': n_components}
+        key = solution_key(returns, None, n_stocks, 'pca_importance', options)
+        
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logging.info(f"PCA solution cache hit ({key[:12]})")
+                return cached['weights'], np.array(cached['stats']['explained_variance'])
+        
+        component_weights, explained_variance, pca_result = apply_pca(returns, n_components)
+        weights = construct_portfolio(component_weights, explained_variance, n_stocks)
+        
+        if cache is not None:
+            family = problem_family(symbols, n_stocks, 'pca_importance', options)
+            cache.put(key, family, weights, stats={'explained_variance': explained_variance.tolist()})
+        
+        return weights, explained_variance
+        
+    except Exception as e:
+        logging.error(f"Error in pca_portfolio: {str(e)}")
+        raise
+
 def plot_results(weights, returns, benchmark_returns, explained_variance, title):
     """
     Plot investment portfolio weights and performance visualization
@@ -117,7 +234,10 @@ def plot_results(weights, returns, benchmark_returns, explained_variance, title)
         
         # Plot cumulative returns
         plt.subplot(4, 1, 2)
-        portfolio_returns = (returns * weights).sum(axis=1)
+        if isinstance(returns, ReturnsPanel):
+            portfolio_returns = returns.portfolio_returns(weights)
+        else:
+            portfolio_returns = (returns * weights).sum(axis=1)
         cumulative_returns = (1 + portfolio_returns).cumprod()
         benchmark_cumulative = (1 + benchmark_returns).cumprod()
         cumulative_returns.plot(label='Portfolio')
@@ -171,20 +291,15 @@ def main():
         
         # Load and process data
         prices = load_data()
-        returns = calculate_returns(prices)
+        returns = ReturnsPanel.from_frame(calculate_returns(prices))
         
         # Load benchmark returns
-        benchmark_returns = pd.read_csv('data/processed/benchmark_returns.csv')
-        benchmark_returns['date'] = pd.to_datetime(benchmark_returns['date'])
-        benchmark_returns = benchmark_returns.set_index('date')['benchmark_return']
+        benchmark_returns = load_benchmark_returns()
         
-        # Apply PCA
+        # Apply PCA and construct portfolio (cached across reruns on the same window)
         n_components = 10
-        component_weights, explained_variance, pca_result = apply_pca(returns, n_components)
-        
-        # Construct portfolio
         n_stocks = 10
-        portfolio_weights = construct_portfolio(component_weights, explained_variance, n_stocks)
+        portfolio_weights, explained_variance = pca_portfolio(returns, n_components, n_stocks, SolutionCache())
         
         # Plot results and get performance metrics
         pca_performance, portfolio_returns = plot_results(portfolio_weights, returns, benchmark_returns, explained_variance, 'PCA')
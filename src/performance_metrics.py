@@ -2,88 +2,121 @@ import pandas as pd
 import numpy as np
 import logging
 import os
+from kernels import rolling_mean, rolling_std, rolling_corr
 
-def calculate_correlation(portfolio_returns, benchmark_returns, window=63):
-    # Calculate rolling correlation between portfolio and benchmark
+# Trading days per year and bars per regular (6.5h) trading session for each bar frequency
+TRADING_DAYS = 252
+BARS_PER_DAY = {
+    '1d': 1,
+    '1h': 7,
+    '30m': 13,
+    '15m': 26,
+    '5m': 78,
+    '1m': 390
+}
+
+def bars_per_day(frequency='1d'):
+    # Number of bars in one trading day for the given bar frequency
+    if frequency not in BARS_PER_DAY:
+        raise ValueError(f"Unsupported bar frequency: {frequency}")
+    return BARS_PER_DAY[frequency]
+
+def periods_per_year(frequency='1d'):
+    # Annualization factor for returns sampled at the given bar frequency
+    return TRADING_DAYS * bars_per_day(frequency)
+
+def align_returns(portfolio_returns, benchmark_returns):
+    # Restrict both series to their common dates, skipping the copy when already aligned
+    if portfolio_returns.index.equals(benchmark_returns.index):
+        return portfolio_returns, benchmark_returns
+    common_index = portfolio_returns.index.intersection(benchmark_returns.index)
+    return portfolio_returns.loc[common_index], benchmark_returns.loc[common_index]
+
+def calculate_correlation(portfolio_returns, benchmark_returns, window=63, frequency='1d'):
+    # Calculate rolling correlation between portfolio and benchmark (window in trading days)
     try:
         # Ensure index alignment
-        common_index = portfolio_returns.index.intersection(benchmark_returns.index)
-        portfolio_returns = portfolio_returns.loc[common_index]
-        benchmark_returns = benchmark_returns.loc[common_index]
+        portfolio_returns, benchmark_returns = align_returns(portfolio_returns, benchmark_returns)
         
         # Calculate rolling correlation
-        correlation = portfolio_returns.rolling(window=window).corr(benchmark_returns)
+        correlation = pd.Series(
+            rolling_corr(portfolio_returns.to_numpy(), benchmark_returns.to_numpy(), window * bars_per_day(frequency)),
+            index=portfolio_returns.index
+        )
         
         return correlation
     except Exception as e:
         logging.error(f"Error in calculate_correlation: {str(e)}")
         raise
 
-def calculate_tracking_error(portfolio_returns, benchmark_returns, window=63):
+def calculate_tracking_error(portfolio_returns, benchmark_returns, window=63, frequency='1d'):
     # Calculate tracking error
     try:
         # Ensure index alignment
-        common_index = portfolio_returns.index.intersection(benchmark_returns.index)
-        portfolio_returns = portfolio_returns.loc[common_index]
-        benchmark_returns = benchmark_returns.loc[common_index]
+        portfolio_returns, benchmark_returns = align_returns(portfolio_returns, benchmark_returns)
         
         # Calculate excess returns
         excess_returns = portfolio_returns - benchmark_returns
         
         # Calculate rolling tracking error
-        tracking_error = excess_returns.rolling(window=window).std() * np.sqrt(252)  # Annualized
+        window = window * bars_per_day(frequency)
+        tracking_error = pd.Series(rolling_std(excess_returns.to_numpy(), window), index=excess_returns.index)
+        tracking_error = tracking_error * np.sqrt(periods_per_year(frequency))  # Annualized
         
         return tracking_error
     except Exception as e:
         logging.error(f"Error in calculate_tracking_error: {str(e)}")
         raise
 
-def calculate_information_ratio(portfolio_returns, benchmark_returns, window=63):
+def calculate_information_ratio(portfolio_returns, benchmark_returns, window=63, frequency='1d'):
     # Calculate information ratio
     try:
         # Ensure index alignment
-        common_index = portfolio_returns.index.intersection(benchmark_returns.index)
-        portfolio_returns = portfolio_returns.loc[common_index]
-        benchmark_returns = benchmark_returns.loc[common_index]
+        portfolio_returns, benchmark_returns = align_returns(portfolio_returns, benchmark_returns)
         
         # Calculate excess returns
         excess_returns = portfolio_returns - benchmark_returns
         
         # Calculate rolling information ratio
-        mean_excess = excess_returns.rolling(window=window).mean() * 252  # Annualized
-        tracking_error = excess_returns.rolling(window=window).std() * np.sqrt(252)  # Annualized
+        window = window * bars_per_day(frequency)
+        annualization = periods_per_year(frequency)
+        mean_excess = rolling_mean(excess_returns.to_numpy(), window) * annualization  # Annualized
+        tracking_error = rolling_std(excess_returns.to_numpy(), window) * np.sqrt(annualization)  # Annualized
         
-        information_ratio = mean_excess / tracking_error
+        information_ratio = pd.Series(mean_excess / tracking_error, index=excess_returns.index)
         
         return information_ratio
     except Exception as e:
         logging.error(f"Error in calculate_information_ratio: {str(e)}")
         raise
 
-def calculate_sharpe_ratio(returns, risk_free_rate=0.02, window=63):
+def calculate_sharpe_ratio(returns, risk_free_rate=0.02, window=63, frequency='1d'):
     # Calculate Sharpe ratio
     try:
+        window = window * bars_per_day(frequency)
+        annualization = periods_per_year(frequency)
+        
         # Calculate excess returns
-        excess_returns = returns - risk_free_rate/252  # Convert to daily risk-free rate
+        excess_returns = returns - risk_free_rate/annualization  # Convert to per-bar risk-free rate
         
         # Calculate rolling Sharpe ratio
-        mean_excess = excess_returns.rolling(window=window).mean() * 252  # Annualized
-        volatility = excess_returns.rolling(window=window).std() * np.sqrt(252)  # Annualized
+        mean_excess = rolling_mean(excess_returns.to_numpy(), window) * annualization  # Annualized
+        volatility = rolling_std(excess_returns.to_numpy(), window) * np.sqrt(annualization)  # Annualized
         
-        sharpe_ratio = mean_excess / volatility
+        sharpe_ratio = pd.Series(mean_excess / volatility, index=excess_returns.index)
         
         return sharpe_ratio
     except Exception as e:
         logging.error(f"Error in calculate_sharpe_ratio: {str(e)}")
         raise
 
-def evaluate_performance(portfolio_returns, benchmark_returns):
+def evaluate_performance(portfolio_returns, benchmark_returns, frequency='1d'):
     # Evaluate portfolio performance over different time periods
     try:
+        annualization = periods_per_year(frequency)
+        
         # Ensure index alignment
-        common_index = portfolio_returns.index.intersection(benchmark_returns.index)
-        portfolio_returns = portfolio_returns.loc[common_index]
-        benchmark_returns = benchmark_returns.loc[common_index]
+        portfolio_returns, benchmark_returns = align_returns(portfolio_returns, benchmark_returns)
         
         # Define time periods
         periods = {
@@ -98,22 +131,23 @@ def evaluate_performance(portfolio_returns, benchmark_returns):
         
         for period_name, days in periods.items():
             # Get recent data
-            recent_portfolio = portfolio_returns.iloc[-days:]
-            recent_benchmark = benchmark_returns.iloc[-days:]
+            bars = days * bars_per_day(frequency)
+            recent_portfolio = portfolio_returns.iloc[-bars:]
+            recent_benchmark = benchmark_returns.iloc[-bars:]
             
             # Calculate correlation
             correlation = recent_portfolio.corr(recent_benchmark)
             
             # Calculate tracking error
             excess_returns = recent_portfolio - recent_benchmark
-            tracking_error = excess_returns.std() * np.sqrt(252)  # Annualized
+            tracking_error = excess_returns.std() * np.sqrt(annualization)  # Annualized
             
             # Calculate information ratio
-            mean_excess = excess_returns.mean() * 252  # Annualized
+            mean_excess = excess_returns.mean() * annualization  # Annualized
             information_ratio = mean_excess / tracking_error if tracking_error > 0 else 0
             
             # Calculate Sharpe ratio
-            sharpe_ratio = calculate_sharpe_ratio(recent_portfolio).iloc[-1]
+            sharpe_ratio = calculate_sharpe_ratio(recent_portfolio, frequency=frequency).iloc[-1]
             
             # Store results
             performance_metrics[period_name] = {
@@ -158,8 +192,8 @@ def load_performance_metrics(method_name):
         logging.error(f"Error in load_performance_metrics: {str(e)}")
         raise
 
-def compare_methods(pca_performance, ampl_performance):
-    # Compare performance metrics between PCA and AMPL methods
+def compare_methods(pca_performance, ampl_performance, output_path='results/method_comparison.csv'):
+    # Compare performance metrics between PCA and AMPL methods; output_path=None only returns the dict
     try:
         comparison = {}
         periods = ['3M', '6M', '9M']
@@ -185,10 +219,11 @@ def compare_methods(pca_performance, ampl_performance):
             }
         
         # Save comparison results
-        comparison_df = pd.DataFrame(comparison).T
-        comparison_df.to_csv('results/method_comparison.csv')
-        
-        logging.info("Method comparison saved to results/method_comparison.csv")
+        if output_path is not None:
+            comparison_df = pd.DataFrame(comparison).T
+            comparison_df.to_csv(output_path)
+            
+            logging.info(f"Method comparison saved to {output_path}")
         return comparison
         
     except Exception as e:
@@ -0,0 +1,334 @@
+import pandas as pd
+import numpy as np
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from returns_panel import ReturnsPanel
+from solution_cache import SolutionCache, hash_file
+from ingest import ingest_raw
+from pca_approach import construct_portfolio, load_benchmark_returns
+from kernels import drifted_backtest
+from performance_metrics import evaluate_performance, save_performance_metrics, compare_methods
+
+# Set up logging configuration
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Directory of the modules listed in Stage.code_deps
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class Stage:
+    def __init__(self, name, func, deps=(), params=None, inputs=(), cache=True, code_deps=()):
+        # A pipeline step: func(upstream_outputs, **params) -> artifact; code_deps names
+        # the src/ modules func calls into, so editing them invalidates the stage
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.code_deps = tuple(code_deps)
+        self.params = params or {}
+        self.inputs = tuple(inputs)
+        self.cache = cache
+
+class Pipeline:
+    def __init__(self, cache_dir='data/cache', max_workers=None, force=False):
+        # Initialize an empty stage graph
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.force = force
+        self.stages = {}
+        self._file_hashes = {}
+
+    def add(self, stage):
+        # Register a stage; dependencies must already be registered
+        missing = [dep for dep in stage.deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+        self.stages[stage.name] = stage
+        return stage
+
+    def file_hash(self, path):
+        # Content hash of an input file, computed once per pipeline
+        if path not in self._file_hashes:
+            self._file_hashes[path] = hash_file(path)
+        return self._file_hashes[path]
+
+    def stage_keys(self):
+        # Hash each stage's code, the modules it uses, params, input files and upstream keys in topological order
+        keys = {}
+        module_hashes = {}
+        for name, stage in self.stages.items():
+            for module in stage.code_deps:
+                if module not in module_hashes:
+                    module_hashes[module] = hash_file(os.path.join(SRC_DIR, f'{module}.py'))
+            payload = {
+                'name': name,
+                'code': inspect.getsource(stage.func),
+                'modules': {module: module_hashes[module] for module in stage.code_deps},
+                'params': stage.params,
+                'inputs': {path: self.file_hash(path) for path in stage.inputs},
+                'deps': {dep: keys[dep] for dep in stage.deps}
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+            keys[name] = hashlib.sha256(encoded).hexdigest()[:16]
+        return keys
+
+    def artifact_path(self, name, key):
+        return os.path.join(self.cache_dir, name, f'{key}.pkl')
+
+    def _load(self, name, key):
+        with open(self.artifact_path(name, key), 'rb') as f:
+            return pickle.load(f)
+
+    def _store(self, name, key, artifact):
+        # Write to a temp file first so an interrupted run never leaves a partial artifact
+        path = self.artifact_path(name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _execute(self, name, key, outputs):
+        stage = self.stages[name]
+        upstream = {dep: outputs[dep] for dep in stage.deps}
+        logging.info(f"Running stage {name} ({key})")
+        artifact = stage.func(upstream, **stage.params)
+        if stage.cache:
+            self._store(name, key, artifact)
+        return artifact
+
+    def run(self):
+        """
+        Run every stage whose cached artifact is missing or stale, running
+        independent branches concurrently
+        """
+        try:
+            keys = self.stage_keys()
+
+            # Decide which stages need computing; a stale stage invalidates its descendants via its key
+            pending = {
+                name for name, stage in self.stages.items()
+                if self.force or not stage.cache or not os.path.exists(self.artifact_path(name, keys[name]))
+            }
+
+            # Only load cached artifacts that a recomputed stage actually consumes
+            outputs = {}
+            for name in self.stages:
+                if name in pending:
+                    continue
+                if any(name in self.stages[child].deps for child in pending):
+                    outputs[name] = self._load(name, keys[name])
+                logging.info(f"Stage {name} up to date ({keys[name]})")
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                running = {}
+                while pending or running:
+                    ready = [
+                        name for name in self.stages
+                        if name in pending and all(dep in outputs for dep in self.stages[name].deps)
+                    ]
+                    for name in ready:
+                        pending.discard(name)
+                        running[executor.submit(self._execute, name, keys[name], outputs)] = name
+
+                    if not running:
+                        raise RuntimeError(f"Unresolvable stages: {sorted(pending)}")
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        outputs[running.pop(future)] = future.result()
+
+            return outputs
+
+        except Exception as e:
+            logging.error(f"Error in Pipeline.run: {str(e)}")
+            raise
+
+def ingest_stage(upstream, raw_path, panel_dir, benchmark_path):
+    # Stream raw prices into on-disk return panels; only the panel location travels downstream
+    ingest_raw(raw_path, panel_dir)
+
+    benchmark = load_benchmark_returns(benchmark_path)
+
+    return {'panel_dir': os.path.join(panel_dir, 'simple'), 'benchmark': benchmark}
+
+def returns_stage(upstream):
+    # Open the memory-mapped simple returns and align complete dates with the benchmark once for every branch
+    returns = ReturnsPanel.load(upstream['ingest']['panel_dir']).dropna()
+    benchmark = upstream['ingest']['benchmark']
+
+    common_index = returns.dates.intersection(benchmark.dropna().index)
+    returns = returns.take(returns.dates.get_indexer(common_index))
+
+    return {'returns': returns, 'benchmark': benchmark.loc[common_index]}
+
+def moments_stage(upstream):
+    # First and second moments of the stock universe
+    returns = upstream['returns']['returns']
+
+    return {
+        'mean': returns.mean(),
+        'cov': returns.cov(),
+        'corr': returns.corr()
+    }
+
+def pca_stage(upstream, n_components, n_stocks, n_candidates):
+    # PCA on standardised returns is the eigen-decomposition of the correlation matrix
+    corr = upstream['moments']['corr']
+    eigenvalues, eigenvectors = np.linalg.eigh(corr.to_numpy())
+    order = np.argsort(eigenvalues)[::-1][:n_components]
+
+    component_weights = pd.DataFrame(
+        eigenvectors[:, order],
+        columns=[f'PC{i+1}' for i in range(n_components)],
+        index=corr.index
+    )
+    explained_variance = eigenvalues[order] / eigenvalues.sum()
+
+    weights = construct_portfolio(component_weights, explained_variance, n_stocks,
+                                  upstream['returns']['returns'], upstream['returns']['benchmark'], n_candidates)
+
+    return {'weights': weights, 'explained_variance': explained_variance}
+
+def ampl_stage(upstream, n_stocks, model_path, solver, data_dir, solution_cache):
+    # Solve the tracking model for this exact returns window, via the shared solution cache
+    from ampl_runner import solve_tracking
+
+    returns = upstream['returns']['returns']
+    benchmark = upstream['returns']['benchmark']
+
+    cache = SolutionCache(solution_cache)
+
+    # solve_tracking writes a private temporary .dat file under data_dir for each solve
+    weights, objective, stats = solve_tracking(returns, benchmark, n_stocks, model_path, data_dir, solver, cache)
+
+    return {'weights': weights, 'objective': objective, 'stats': stats}
+
+def metrics_stage(upstream, method):
+    # Backtest the weights of one branch against the benchmark
+    returns = upstream['returns']['returns']
+    benchmark = upstream['returns']['benchmark']
+    weights = upstream[f'optimize_{method}']['weights']
+
+    portfolio_returns = returns.portfolio_returns(weights)
+
+    # Buy-and-hold variant: weights drift with prices instead of being rebalanced every period
+    held_returns = drifted_backtest(returns.values[:, returns.symbol_positions(weights.index)], weights.to_numpy())
+    held_returns = pd.Series(held_returns, index=returns.dates)
+
+    return {
+        'portfolio_returns': portfolio_returns,
+        'performance': evaluate_performance(portfolio_returns, benchmark),
+        'buy_and_hold_returns': held_returns,
+        'buy_and_hold_performance': evaluate_performance(held_returns, benchmark)
+    }
+
+def compare_stage(upstream):
+    # Compare the two branches on identical inputs; writing results/ is left to report_stage
+    return compare_methods(upstream['metrics_pca']['performance'], upstream['metrics_ampl']['performance'],
+                           output_path=None)
+
+def report_stage(upstream):
+    # Persist the final tables to results/; not cached so results/ always reflects the run
+    os.makedirs('results', exist_ok=True)
+
+    for name, artifact in upstream.items():
+        if name.startswith('metrics_'):
+            method_name = name[len('metrics_'):].upper()
+            save_performance_metrics(artifact['performance'], method_name)
+            save_performance_metrics(artifact['buy_and_hold_performance'], f'{method_name}_buy_and_hold')
+
+    if 'compare' in upstream:
+        pd.DataFrame(upstream['compare']).T.to_csv('results/method_comparison.csv')
+
+    weights = pd.DataFrame({
+        name[len('optimize_'):].upper(): artifact['weights']
+        for name, artifact in upstream.items() if name.startswith('optimize_')
+    })
+    weights.to_csv('results/pipeline_weights.csv')
+
+    logging.info("Pipeline report saved to results/")
+    return weights
+
+def build_pipeline(args):
+    """
+    Build the ingest -> returns -> moments -> optimize -> metrics -> compare -> report DAG
+    """
+    pipeline = Pipeline(cache_dir=args.cache_dir, max_workers=args.max_workers, force=args.force)
+
+    # Panels are stored per raw-file content, so a cached ingest artifact never points at another file's panel
+    panel_dir = os.path.join(args.cache_dir, 'panel', pipeline.file_hash(args.raw_path)[:16])
+    pipeline.add(Stage('ingest', ingest_stage,
+                       params={'raw_path': args.raw_path, 'panel_dir': panel_dir,
+                               'benchmark_path': args.benchmark_path},
+                       inputs=(args.raw_path, args.benchmark_path), code_deps=('ingest', 'returns_panel')))
+    pipeline.add(Stage('returns', returns_stage, deps=('ingest',), code_deps=('returns_panel',)))
+    pipeline.add(Stage('moments', moments_stage, deps=('returns',), code_deps=('returns_panel',)))
+
+    methods = ['pca'] if args.skip_ampl else ['pca', 'ampl']
+
+    pipeline.add(Stage('optimize_pca', pca_stage, deps=('returns', 'moments'),
+                       params={'n_components': args.n_components, 'n_stocks': args.n_stocks,
+                               'n_candidates': args.pca_swap_candidates},
+                       code_deps=('pca_approach', 'kernels', 'returns_panel')))
+    if 'ampl' in methods:
+        pipeline.add(Stage('optimize_ampl', ampl_stage, deps=('returns',),
+                           params={'n_stocks': args.n_stocks, 'model_path': args.model_path,
+                                   'solver': args.solver, 'data_dir': os.path.join(args.cache_dir, 'ampl'),
+                                   'solution_cache': os.path.join(args.cache_dir, 'solutions.sqlite')},
+                           inputs=(args.model_path,),
+                           code_deps=('ampl_runner', 'generate_data', 'solution_cache', 'returns_panel')))
+
+    for method in methods:
+        pipeline.add(Stage(f'metrics_{method}', metrics_stage, deps=('returns', f'optimize_{method}'),
+                           params={'method': method},
+                           code_deps=('performance_metrics', 'kernels', 'returns_panel')))
+
+    report_deps = [f'metrics_{method}' for method in methods]
+    report_deps += [f'optimize_{method}' for method in methods]
+    if 'ampl' in methods:
+        pipeline.add(Stage('compare', compare_stage, deps=('metrics_pca', 'metrics_ampl'),
+                           code_deps=('performance_metrics',)))
+        report_deps.append('compare')
+
+    pipeline.add(Stage('report', report_stage, deps=report_deps, cache=False))
+
+    return pipeline
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the S&P 100 tracking pipeline with cached stages')
+    parser.add_argument('--raw-path', default='data/raw/stock_data.csv')
+    parser.add_argument('--benchmark-path', default='data/processed/benchmark_returns.csv')
+    parser.add_argument('--model-path', default='data/ampl/sp100_tracking.mod')
+    parser.add_argument('--cache-dir', default='data/cache')
+    parser.add_argument('--n-stocks', type=int, default=10)
+    parser.add_argument('--n-components', type=int, default=10)
+    parser.add_argument('--pca-swap-candidates', type=int, default=0,
+                        help='Refine the PCA selection by swapping in up to this many next-ranked stocks')
+    parser.add_argument('--solver', default='ipopt')
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--skip-ampl', action='store_true', help='Only run the PCA branch')
+    parser.add_argument('--force', action='store_true', help='Ignore cached artifacts')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+        pipeline = build_pipeline(args)
+        pipeline.run()
+
+        logging.info("Pipeline completed successfully")
+
+    except Exception as e:
+        logging.error(f"Error in main: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import pandas as pd
+import numpy as np
+import logging
+import os
+
+class ReturnsPanel:
+    """
+    Compact dates x symbols returns block
+
+    Returns live in one C-contiguous float32 (or float64) array with missing
+    cells stored as 0 and flagged in a boolean validity mask. Date and symbol
+    labels are built once; row windows are zero-copy views of the same block.
+    """
+
+    def __init__(self, values, valid, dates, symbols):
+        self.values = values
+        self.valid = valid
+        self.dates = dates
+        self.symbols = symbols
+        self._symbol_positions = None
+
+    @classmethod
+    def from_frame(cls, returns, dtype=np.float32):
+        # Build a panel from a wide DataFrame of returns (dates x symbols)
+        try:
+            raw = returns.to_numpy(dtype=np.float64)
+            valid = ~np.isnan(raw)
+            values = np.ascontiguousarray(np.where(valid, raw, 0.0), dtype=dtype)
+
+            return cls(values, valid, pd.Index(returns.index), pd.Index(returns.columns.astype(str)))
+
+        except Exception as e:
+            logging.error(f"Error in ReturnsPanel.from_frame: {str(e)}")
+            raise
+
+    @classmethod
+    def from_long(cls, df, value='log_return', dtype=np.float32):
+        # Build a panel from long (date, symbol, value) rows with a single pivot
+        try:
+            df = df.drop_duplicates(subset=['date', 'symbol'], keep='first')
+            wide = df.pivot(index='date', columns='symbol', values=value)
+            return cls.from_frame(wide, dtype=dtype)
+
+        except Exception as e:
+            logging.error(f"Error in ReturnsPanel.from_long: {str(e)}")
+            raise
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        # Open a panel written by save() or the streaming ingest; blocks are memory-mapped by default
+        try:
+            values = np.load(os.path.join(directory, 'values.npy'), mmap_mode=mmap_mode)
+            valid = np.load(os.path.join(directory, 'valid.npy'), mmap_mode=mmap_mode)
+            dates = pd.DatetimeIndex(pd.to_datetime(np.load(os.path.join(directory, 'dates.npy')), utc=True), name='date')
+            symbols = pd.Index(np.load(os.path.join(directory, 'symbols.npy')).astype(str), name='symbol')
+
+            return cls(values, valid, dates, symbols)
+
+        except Exception as e:
+            logging.error(f"Error in ReturnsPanel.load: {str(e)}")
+            raise
+
+    def save(self, directory):
+        # Write the blocks and labels as .npy files (dates stored as UTC nanoseconds)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            np.save(os.path.join(directory, 'values.npy'), self.values)
+            np.save(os.path.join(directory, 'valid.npy'), self.valid)
+            np.save(os.path.join(directory, 'dates.npy'), utc_nanoseconds(self.dates))
+            np.save(os.path.join(directory, 'symbols.npy'), np.asarray(self.symbols, dtype=str))
+
+        except Exception as e:
+            logging.error(f"Error in ReturnsPanel.save: {str(e)}")
+            raise
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.valid.nbytes
+
+    def __len__(self):
+        return len(self.dates)
+
+    def to_frame(self):
+        # Materialize a float64 DataFrame with NaN for missing cells
+        values = np.where(self.valid, self.values, np.nan)
+        return pd.DataFrame(values, index=self.dates, columns=self.symbols)
+
+    def window(self, start=None, stop=None):
+        # Zero-copy view of the rows in [start, stop) given as positions
+        rows = slice(start, stop)
+        return ReturnsPanel(self.values[rows], self.valid[rows], self.dates[rows], self.symbols)
+
+    def window_dates(self, start_date=None, end_date=None):
+        # Zero-copy view of the rows between two dates (inclusive)
+        start = None if start_date is None else self.dates.searchsorted(start_date, side='left')
+        stop = None if end_date is None else self.dates.searchsorted(end_date, side='right')
+        return self.window(start, stop)
+
+    def tail(self, n):
+        return self.window(max(len(self) - n, 0), None)
+
+    def take(self, rows):
+        # Rows at the given sorted positions; a zero-copy window when they are contiguous
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0 or rows[-1] - rows[0] + 1 == len(rows):
+            start = rows[0] if len(rows) else 0
+            return self.window(start, start + len(rows))
+        return ReturnsPanel(self.values[rows], self.valid[rows], self.dates[rows], self.symbols)
+
+    def symbol_positions(self, symbols):
+        # Integer column positions for the given symbols, from a lookup built once
+        if self._symbol_positions is None:
+            self._symbol_positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        return np.array([self._symbol_positions[str(symbol)] for symbol in symbols], dtype=np.intp)
+
+    def select(self, symbols):
+        # Column subset (a copy, since the columns are not contiguous)
+        columns = self.symbol_positions(symbols)
+        return ReturnsPanel(
+            np.ascontiguousarray(self.values[:, columns]),
+            np.ascontiguousarray(self.valid[:, columns]),
+            self.dates,
+            self.symbols[columns]
+        )
+
+    def complete_rows(self):
+        # Boolean row mask of dates where every symbol has a return
+        return self.valid.all(axis=1)
+
+    def dropna(self):
+        # Keep only complete rows (the equivalent of DataFrame.dropna())
+        rows = self.complete_rows()
+        if rows.all():
+            return self
+        return ReturnsPanel(self.values[rows], self.valid[rows], self.dates[rows], self.symbols)
+
+    def align(self, series):
+        # Reindex a date-indexed Series onto the panel dates as a float64 array
+        if series.index.equals(self.dates):
+            return series.to_numpy(dtype=np.float64)
+        return series.reindex(self.dates).to_numpy(dtype=np.float64)
+
+    def portfolio_returns(self, weights):
+        # Weighted returns per date, accumulated in float64; missing cells contribute 0
+        columns = self.symbol_positions(weights.index)
+        values = self.values[:, columns].astype(np.float64) @ weights.to_numpy(dtype=np.float64)
+        return pd.Series(values, index=self.dates)
+
+    def describe(self):
+        # Per-symbol mean, std, min and max over valid cells, reduced in place without a NaN copy
+        counts = self.valid.sum(axis=0)
+        sums = np.sum(self.values, axis=0, where=self.valid, dtype=np.float64)
+        squares = np.sum(np.square(self.values, dtype=np.float64), axis=0, where=self.valid)
+        mean = sums / np.maximum(counts, 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.maximum(squares - counts * mean ** 2, 0) / (counts - 1))
+
+        stats = pd.DataFrame({
+            'mean': np.where(counts > 0, mean, np.nan),
+            'std': np.where(counts > 1, std, np.nan),
+            'min': np.min(self.values, axis=0, where=self.valid, initial=np.inf),
+            'max': np.max(self.values, axis=0, where=self.valid, initial=-np.inf)
+        }, index=self.symbols)
+        stats.loc[counts == 0, ['min', 'max']] = np.nan
+        return stats.T
+
+    def mean(self):
+        # Per-symbol mean over valid cells
+        counts = self.valid.sum(axis=0)
+        sums = self.values.sum(axis=0, dtype=np.float64)
+        return pd.Series(sums / np.maximum(counts, 1), index=self.symbols)
+
+    def cov(self):
+        # Sample covariance over complete rows
+        values = self.dropna().values.astype(np.float64)
+        return pd.DataFrame(np.cov(values, rowvar=False), index=self.symbols, columns=self.symbols)
+
+    def corr(self):
+        # Correlation over complete rows
+        values = self.dropna().values.astype(np.float64)
+        return pd.DataFrame(np.corrcoef(values, rowvar=False), index=self.symbols, columns=self.symbols)
+
+def utc_nanoseconds(dates):
+    # int64 UTC nanoseconds for a (tz-aware or naive) date index
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is None:
+        dates = dates.tz_localize('UTC')
+    return dates.tz_convert('UTC').tz_localize(None).values.astype('datetime64[ns]').astype(np.int64)
+
+def as_frame(returns):
+    # Let DataFrame-only code accept either a ReturnsPanel or a DataFrame
+    if isinstance(returns, ReturnsPanel):
+        return returns.to_frame()
+    return returns
@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from returns_panel import ReturnsPanel, utc_nanoseconds
+
+def _hash_frame(digest, data):
+    # Feed a returns window (DataFrame, Series or ReturnsPanel) into a hash
+    if isinstance(data, ReturnsPanel):
+        digest.update(np.ascontiguousarray(data.values, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(data.valid).tobytes())
+        index, columns = data.dates, data.symbols
+    else:
+        digest.update(np.ascontiguousarray(data.to_numpy(dtype=np.float64)).tobytes())
+        index = data.index
+        columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+
+    if isinstance(index, pd.DatetimeIndex):
+        digest.update(utc_nanoseconds(index).tobytes())
+    else:
+        digest.update('\x1f'.join(map(str, index)).encode())
+    digest.update('\x1f'.join(map(str, columns)).encode())
+
+def problem_family(symbols, q, model, options=None):
+    """
+    Hash of everything except the data: solves in the same family are
+    near-identical problems whose weights make a good warm start
+    """
+    payload = json.dumps({
+        'symbols': list(map(str, symbols)),
+        'q': q,
+        'model': model,
+        'options': options or {}
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def solution_key(returns, benchmark, q, model, options=None):
+    """
+    Content hash of (returns window, benchmark, q, model/objective, solver options)
+    """
+    symbols = returns.symbols if isinstance(returns, ReturnsPanel) else returns.columns
+    digest = hashlib.sha256(problem_family(symbols, q, model, options).encode())
+    _hash_frame(digest, returns)
+    if benchmark is not None:
+        _hash_frame(digest, benchmark)
+    return digest.hexdigest()
+
+def hash_file(path, chunk_size=1 << 20):
+    # Content hash of a file (model, input data, source module), read in chunks
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SolutionCache:
+    """
+    Disk-backed cache of optimizer solutions with size-bounded LRU eviction
+
+    Entries live in a SQLite database in WAL mode; every operation opens its
+    own connection and writes run inside IMMEDIATE transactions, so several
+    worker processes can share one cache file safely.
+    """
+
+    def __init__(self, path='data/cache/solutions.sqlite', max_bytes=64 * 1024 * 1024, timeout=30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS solutions (
+                    key TEXT PRIMARY KEY,
+                    family TEXT NOT NULL,
+                    weights TEXT NOT NULL,
+                    objective REAL,
+                    stats TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_family ON solutions (family, last_access)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON solutions (last_access)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout = %d' % (self.timeout * 1000))
+        return _Connection(conn)
+
+    @staticmethod
+    def _entry(row):
+        weights, objective, stats = row
+        return {
+            'weights': pd.Series(json.loads(weights), dtype=float),
+            'objective': objective,
+            'stats': json.loads(stats)
+        }
+
+    def get(self, key):
+        # Exact hit: return the stored solution and mark it most recently used
+        try:
+            with self._connect() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute(
+                    'SELECT weights, objective, stats FROM solutions WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE solutions SET last_access = ? WHERE key = ?', (time.time(), key))
+                conn.execute('COMMIT')
+
+            return None if row is None else self._entry(row)
+
+        except Exception as e:
+            logging.error(f"Error in SolutionCache.get: {str(e)}")
+            raise
+
+    def warm_start(self, family):
+        # Weights of the most recently used solve in the same problem family
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT weights, objective, stats FROM solutions WHERE family = ? '
+                    'ORDER BY last_access DESC LIMIT 1', (family,)
+                ).fetchone()
+
+            return None if row is None else self._entry(row)['weights']
+
+        except Exception as e:
+            logging.error(f"Error in SolutionCache.warm_start: {str(e)}")
+            raise
+
+    def put(self, key, family, weights, objective=None, stats=None):
+        # Store a solution, then evict least recently used entries beyond max_bytes
+        try:
+            weights_json = json.dumps({str(k): float(v) for k, v in weights.items()})
+            stats_json = json.dumps(stats or {}, default=str)
+            size = len(key) + len(family) + len(weights_json) + len(stats_json)
+
+            with self._connect() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key, family, weights_json, objective, stats_json, size, time.time())
+                )
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM solutions').fetchone()[0]
+                while total > self.max_bytes:
+                    oldest = conn.execute(
+                        'SELECT key, size FROM solutions WHERE key != ? ORDER BY last_access LIMIT 1', (key,)
+                    ).fetchone()
+                    if oldest is None:
+                        break
+                    conn.execute('DELETE FROM solutions WHERE key = ?', (oldest[0],))
+                    total -= oldest[1]
+                conn.execute('COMMIT')
+
+        except Exception as e:
+            logging.error(f"Error in SolutionCache.put: {str(e)}")
+            raise
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM solutions')
+
+class _Connection:
+    # Context manager that always closes the connection and rolls back an open transaction on error
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.conn.in_transaction:
+            self.conn.execute('ROLLBACK')
+        self.conn.close()
+        return False
@@ -0,0 +1,84 @@
+import importlib
+import os
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+from solution_cache import SolutionCache
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'data', 'ampl', 'sp100_tracking.mod')
+
+class _Value:
+    def __init__(self, value):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+class _StubAMPL:
+    # Just enough of amplpy.AMPL for solve_tracking to read a solution
+    def __init__(self, stocks, solve_result):
+        self.stocks = stocks
+        self.solve_result = solve_result
+
+    def getVariable(self, name):
+        return {stock: _Value(1.0 / len(self.stocks)) for stock in self.stocks}
+
+    def getSet(self, name):
+        return self.stocks
+
+    def getObjective(self, name):
+        return _Value(0.01)
+
+    def getValue(self, name):
+        return self.solve_result if name == 'solve_result' else 0.0
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def ampl_runner(monkeypatch):
+    # The solver itself is stubbed, so amplpy/yfinance only need to be importable
+    for name in ('amplpy', 'yfinance'):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+    monkeypatch.delitem(sys.modules, 'ampl_runner', raising=False)
+    module = importlib.import_module('ampl_runner')
+    yield module
+    sys.modules.pop('ampl_runner', None)
+
+def _problem():
+    rng = np.random.default_rng(0)
+    returns = pd.DataFrame(rng.normal(0, 0.01, (40, 4)), columns=list('ABCD'),
+                           index=pd.date_range('2024-01-02', periods=40, tz='UTC'))
+    return returns, returns.mean(axis=1)
+
+@pytest.mark.parametrize('solve_result, cached', [('solved', True), ('infeasible', False), ('failure', False)])
+def test_only_solved_results_are_cached(ampl_runner, monkeypatch, tmp_path, solve_result, cached):
+    returns, benchmark = _problem()
+    solves = []
+
+    def run_ampl_model(model_path, data_path, solver, initial_weights):
+        solves.append(initial_weights)
+        return _StubAMPL(list(returns.columns), solve_result)
+
+    monkeypatch.setattr(ampl_runner, 'run_ampl_model', run_ampl_model)
+    cache = SolutionCache(str(tmp_path / 'solutions.sqlite'))
+
+    for _ in range(2):
+        weights, objective, stats = ampl_runner.solve_tracking(
+            returns, benchmark, 2, MODEL_PATH, str(tmp_path), cache=cache)
+        assert stats['solve_result'] == solve_result
+
+    # A cached solve is answered from the cache the second time; a failed one is solved again, cold
+    assert len(cache) == (1 if cached else 0)
+    assert len(solves) == (1 if cached else 2)
+    assert all(initial_weights is None for initial_weights in solves)
+    assert not any(name.endswith('.dat') for name in os.listdir(tmp_path))
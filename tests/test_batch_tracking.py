@@ -0,0 +1,82 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import minimize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+from batch_tracking import _gram_and_cross, align_batch, solve_tracking_weights
+from returns_panel import ReturnsPanel
+
+def _instance(seed, n_stocks=8, n_periods=60):
+    # Two-factor returns and a benchmark with some short exposures, so the
+    # non-negativity constraints bind and pinned stocks sometimes have to come back
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (n_periods, 2))
+    returns = factors @ rng.normal(1, 0.7, (2, n_stocks)) + rng.normal(0, 0.004, (n_periods, n_stocks))
+    benchmark = returns @ rng.normal(0.1, 0.4, n_stocks) + rng.normal(0, 0.003, n_periods)
+    return returns.T @ returns, returns.T @ benchmark
+
+def _objective(gram, cross, w):
+    return w @ gram @ w - 2 * cross @ w
+
+def _reference(gram, cross):
+    n = len(cross)
+    result = minimize(
+        lambda w: _objective(gram, cross, w), np.full(n, 1.0 / n),
+        jac=lambda w: 2 * gram @ w - 2 * cross,
+        bounds=[(0, None)] * n,
+        constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1, 'jac': lambda w: np.ones(n)}],
+        method='SLSQP', options={'ftol': 1e-15, 'maxiter': 1000}
+    )
+    return result.x
+
+@pytest.mark.parametrize('seed', range(40))
+def test_tracking_weights_match_reference_solver(seed):
+    gram, cross = _instance(seed)
+    weights = solve_tracking_weights(gram, cross, range(len(cross)))
+    expected = _reference(gram, cross)
+
+    assert weights.min() >= 0
+    assert weights.sum() == pytest.approx(1.0, abs=1e-12)
+    # Never worse than the reference and the same optimum
+    assert _objective(gram, cross, weights) <= _objective(gram, cross, expected) + 1e-12
+    np.testing.assert_allclose(weights, expected, atol=1e-5)
+
+def test_unselected_stocks_get_zero_weight():
+    gram, cross = _instance(0, n_stocks=10)
+    selected = [1, 4, 6, 7, 9]
+    weights = solve_tracking_weights(gram, cross, selected)
+
+    assert np.count_nonzero(weights[[0, 2, 3, 5, 8]]) == 0
+    sub = np.ix_(selected, selected)
+    np.testing.assert_allclose(weights[selected], _reference(gram[sub], cross[selected]), atol=1e-5)
+
+def test_panel_alignment_and_blocked_products_match_dataframe():
+    rng = np.random.default_rng(3)
+    dates = pd.date_range('2024-01-02', periods=120, tz='UTC')
+    returns = pd.DataFrame(rng.normal(0, 0.01, (120, 6)), index=dates, columns=list('ABCDEF'))
+    returns.iloc[[5, 40, 41, 90], [1, 3, 0, 5]] = np.nan
+    benchmarks = pd.DataFrame(rng.normal(0, 0.01, (110, 3)), index=dates[10:], columns=['X', 'Y', 'Z'])
+    benchmarks.iloc[30, 1] = np.nan
+
+    panel, aligned = align_batch(ReturnsPanel.from_frame(returns, dtype=np.float64), benchmarks)
+
+    # Reference: common dates where every stock and every benchmark has a value
+    common = returns.index.intersection(benchmarks.index)
+    keep = returns.loc[common].notna().all(axis=1) & benchmarks.loc[common].notna().all(axis=1)
+    expected_returns = returns.loc[common][keep].to_numpy()
+    expected_benchmarks = benchmarks.loc[common][keep].to_numpy()
+    assert panel.dates.equals(common[keep.to_numpy()])
+    np.testing.assert_array_equal(aligned.to_numpy(), expected_benchmarks)
+
+    # Blocks that split the rows unevenly, with some rows excluded
+    rows = np.ones(len(panel), dtype=bool)
+    rows[[0, 17, 18, 50]] = False
+    gram, cross = _gram_and_cross(panel.values, rows, expected_benchmarks[rows], block_size=16)
+    R = expected_returns[rows]
+    np.testing.assert_allclose(gram, R.T @ R, atol=1e-14)
+    np.testing.assert_allclose(cross, R.T @ expected_benchmarks[rows], atol=1e-14)
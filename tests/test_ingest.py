@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+from ingest import ingest_raw
+
+def _long_prices():
+    # Interleaved symbols, one of which starts late, written as one long-format frame
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2024-03-01', periods=40, freq='B', tz='America/New_York')
+    frames = []
+    for symbol, start in [('AAA', 0), ('BBB', 0), ('CCC', 7)]:
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates) - start)))
+        frames.append(pd.DataFrame({'date': dates[start:], 'symbol': symbol, 'Close': prices}))
+    return pd.concat(frames).sort_values(['date', 'symbol'], kind='stable').reset_index(drop=True)
+
+def _write(df, path):
+    out = df.copy()
+    out['date'] = out['date'].map(lambda d: d.isoformat(sep=' '))
+    out.to_csv(path, index=False)
+
+def _expected(df):
+    prices = df.drop_duplicates(['date', 'symbol']).pivot(index='date', columns='symbol', values='Close')
+    prices.index = prices.index.tz_convert('UTC')
+    return prices.pct_change().iloc[1:]
+
+@pytest.mark.parametrize('chunksize', [1, 5, 7, 1000])
+def test_ingest_matches_pivot_pct_change(tmp_path, chunksize):
+    df = _long_prices()
+    # A later repeat of an earlier block (as in the real raw file) must be ignored
+    raw = pd.concat([df, df[df['symbol'] == 'AAA'].iloc[:12], df[df['symbol'] == 'BBB'].iloc[3:9]])
+    path = tmp_path / 'raw.csv'
+    _write(raw, path)
+
+    panels = ingest_raw(str(path), str(tmp_path / 'panel'), chunksize=chunksize, dtype=np.float64)
+    expected = _expected(df)
+
+    simple = panels['simple'].to_frame()
+    assert list(simple.columns) == ['AAA', 'BBB', 'CCC']
+    assert simple.index[1:].equals(expected.index)
+    np.testing.assert_allclose(simple.iloc[1:].to_numpy(), expected.to_numpy(), atol=1e-12)
+    np.testing.assert_allclose(panels['log'].to_frame().iloc[1:].to_numpy(), np.log1p(expected.to_numpy()), atol=1e-12)
+
+    # The first date only seeds prices, and the scratch dedup mask is removed
+    assert not panels['simple'].valid[0].any()
+    assert not os.path.exists(tmp_path / 'panel' / 'seen.npy')
+
+def test_ingest_rejects_out_of_order_rows(tmp_path):
+    df = _long_prices()
+    rows = df.index[df['symbol'] == 'BBB']
+    # Swap two consecutive BBB rows so its dates go backwards
+    df.loc[[rows[4], rows[5]], 'Close'] = df.loc[[rows[5], rows[4]], 'Close'].to_numpy()
+    df.loc[[rows[4], rows[5]], 'date'] = df.loc[[rows[5], rows[4]], 'date'].to_numpy()
+    path = tmp_path / 'raw.csv'
+    _write(df, path)
+
+    with pytest.raises(ValueError, match='BBB'):
+        ingest_raw(str(path), str(tmp_path / 'panel'), chunksize=5)
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+import kernels
+
+BACKENDS = [False, True] if kernels.NUMBA_AVAILABLE else [False]
+
+def _series():
+    rng = np.random.default_rng(0)
+    x = rng.normal(0, 0.01, 300)
+    y = 0.8 * x + rng.normal(0, 0.005, 300)
+    # Degenerate stretches: flat (zero-filled) cells, a NaN and a constant pair
+    x[50:70] = 0.0
+    y[60:80] = 0.0
+    x[120] = np.nan
+    x[200:210] = 1.0
+    y[200:210] = 1.0
+    return x, y
+
+@pytest.fixture(params=BACKENDS, ids=lambda jit: 'jit' if jit else 'numpy')
+def backend(request, monkeypatch):
+    monkeypatch.setattr(kernels, 'USE_JIT', request.param)
+    return request.param
+
+@pytest.mark.parametrize('window', [1, 2, 5, 63])
+def test_rolling_kernels_match_pandas(backend, window):
+    x, y = _series()
+    sx, sy = pd.Series(x), pd.Series(y)
+
+    np.testing.assert_allclose(kernels.rolling_mean(x, window), sx.rolling(window).mean(), atol=1e-12)
+    np.testing.assert_allclose(kernels.rolling_std(x, window), sx.rolling(window).std(), atol=1e-10)
+    np.testing.assert_allclose(kernels.rolling_corr(x, y, window), sx.rolling(window).corr(sy), atol=1e-8)
+
+def test_zero_variance_windows_give_nan_not_error(backend):
+    ones = np.ones(30)
+    assert np.isnan(kernels.rolling_corr(ones, ones, 5)).all()
+    assert np.isnan(kernels.rolling_std(ones, 1)).all()
+    np.testing.assert_array_equal(kernels.rolling_std(ones, 5)[4:], 0.0)
+
+def test_window_longer_than_series(backend):
+    assert np.isnan(kernels.rolling_std(np.arange(3.0), 5)).all()
+
+def test_drifted_backtest_and_candidates_match_reference(backend):
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0, 0.01, (200, 12))
+    weights = np.full(12, 1 / 12)
+    benchmark = returns.mean(axis=1)
+    candidates = np.array([rng.choice(12, 4, replace=False) for _ in range(30)])
+    candidate_weights = rng.dirichlet(np.ones(4), size=30)
+
+    # Buy-and-hold reference: holdings grow with their own returns
+    holdings = weights.copy()
+    expected = []
+    for row in returns:
+        value = holdings.sum()
+        holdings = holdings * (1 + row)
+        expected.append(holdings.sum() / value - 1)
+    np.testing.assert_allclose(kernels.drifted_backtest(returns, weights), expected, atol=1e-12)
+
+    # Tracking error reference: sample std of each candidate's excess returns
+    for weighted in (None, candidate_weights):
+        errors = kernels.candidate_tracking_errors(returns, benchmark, candidates, weighted)
+        w = np.full(candidates.shape, 0.25) if weighted is None else weighted
+        expected_errors = [np.std(returns[:, c] @ wc - benchmark, ddof=1) for c, wc in zip(candidates, w)]
+        np.testing.assert_allclose(errors, expected_errors, atol=1e-12)